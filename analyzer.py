@@ -1,75 +1,396 @@
+import numpy as np
 import pandas as pd
+import pytz
+from datetime import timedelta
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
-from data_loader import fetch_market_data
+import profiler
+from data_loader import fetch_market_data_batch, fetch_span_data, plan_interval, INTERVALS
+from impact_cache import load_impacts, store_impacts
+from impact_series import ImpactSeries
 
-def calculate_impact(event_row):
+def _to_utc(ts):
     """
-    Calculates the impact of an event on all configured assets.
-    Returns a dictionary of DataFrames, one for each asset, normalized to 0% at event time.
+    Returns the timestamp as a UTC-aware pandas Timestamp (naive = UTC).
+    """
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+def _close_matrix(market_data):
+    """
+    Aligns every ticker's Close series on one UTC time index (time x ticker).
+    Each ticker's bar interval is kept in closes.attrs['intervals'], and the tickers
+    whose download failed (see data_loader.failed_frame) in closes.attrs['failed'].
+    """
+    closes = {}
+    intervals = {}
+    failed = [ticker for ticker, df in market_data.items() if df is not None and df.attrs.get('failed')]
+    for ticker, df in market_data.items():
+        if df is None or df.empty:
+            continue
+        intervals[ticker] = df.attrs.get('interval')
+
+        close = df['Close']
+        # Handle case where 'Close' is a DataFrame (rare yfinance quirk)
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+
+        if close.index.tz is None:
+            close.index = close.index.tz_localize('UTC')
+        else:
+            close.index = close.index.tz_convert('UTC')
+        closes[ticker] = close
+
+    matrix = pd.concat(closes, axis=1).sort_index() if closes else pd.DataFrame()
+    matrix.attrs['intervals'] = intervals
+    matrix.attrs['failed'] = failed
+    return matrix
+
+def _fetched(tickers, closes):
+    """
+    The tickers whose download went through (with or without bars), i.e. the ones
+    whose results may be stored.
+    """
+    failed = set(closes.attrs.get('failed', ()))
+    return [ticker for ticker in tickers if ticker not in failed]
+
+def normalize_window(closes, event_time):
+    """
+    Slices one event's window out of a close matrix and normalizes it to 0% at event time.
+    Returns (pct_change, minutes_relative): a time x ticker DataFrame (NaN where a ticker
+    has no bar) and the matching minutes relative to the event. Both are empty if no bars.
+    """
+    event_time = _to_utc(event_time)
+    start_time = event_time - timedelta(minutes=config.PRE_EVENT_MINUTES)
+    end_time = event_time + timedelta(minutes=config.POST_EVENT_MINUTES)
+
+    # One searchsorted per event: window bounds plus the bar nearest to the release
+    index = closes.index
+    lo, hi, pos = index.searchsorted([start_time, end_time, event_time])
+    window = closes.iloc[lo:hi]
+    if window.empty:
+        return window, pd.Index([], dtype=float)
+
+    pos = min(max(pos, lo), hi - 1)
+    if pos > lo and (index[pos] - event_time) > (event_time - index[pos - 1]):
+        pos -= 1
+
+    # Find the price at the exact minute the event happened
+    # Assets without a bar on that row take their nearest earlier (or later) price
+    baseline = _coarse_baselines(closes, event_time, window.ffill().bfill().iloc[pos - lo])
+
+    # Calculate percentage change: (Current Price - Baseline) / Baseline * 100
+    # This makes all assets start at 0% so we can compare them easily
+    pct_change = (window / baseline - 1) * 100
+
+    # Calculate minutes relative to event (e.g., -15, 0, +60)
+    minutes_relative = (window.index - event_time).total_seconds() / 60
+    return pct_change, minutes_relative
+
+def _coarse_baselines(closes, event_time, baseline):
+    """
+    Coarser bars are labelled by their start but priced at their end, so the bar nearest
+    the release already contains the reaction. Tickers on bars above 1m take the close of
+    the last bar that ends at or before the release instead (NaN if there is none).
+    """
+    baseline = baseline.copy()
+    intervals = closes.attrs.get('intervals', {})
+    by_length = {}
+    for ticker, interval in intervals.items():
+        length = pd.Timedelta(INTERVALS[interval]) if interval in INTERVALS else None
+        if length is not None and length > pd.Timedelta(minutes=1) and ticker in closes.columns:
+            by_length.setdefault(length, []).append(ticker)
+
+    for length, tickers in by_length.items():
+        end = closes.index.searchsorted(event_time - length, side='right')
+        before = closes[tickers].iloc[:end].ffill()
+        baseline[tickers] = before.iloc[-1] if end else np.nan
+    return baseline
+
+def _impact_from_closes(closes, event_time):
+    """
+    Normalizes one event's window and splits it into one ImpactSeries per ticker,
+    tagged with the bar interval it was built from.
+    """
+    pct_change, minutes_relative = normalize_window(closes, event_time)
+    intervals = closes.attrs.get('intervals', {})
+    values = pct_change.to_numpy(dtype=float)
+    minutes = np.asarray(minutes_relative, dtype=float)
+
+    impact = {}
+    for i, ticker in enumerate(pct_change.columns):
+        has_bar = ~np.isnan(values[:, i])
+        if not has_bar.any():
+            continue
+        impact[ticker] = ImpactSeries.from_arrays(
+            event_time, minutes[has_bar], values[has_bar, i], intervals.get(ticker)
+        )
+    return impact
+
+def _by_asset_name(impact_by_ticker):
+    """
+    Re-keys a ticker -> impact dictionary by the asset names in config.ASSETS.
+    """
+    return {
+        asset_name: impact_by_ticker[ticker]
+        for asset_name, ticker in config.ASSETS.items()
+        if ticker in impact_by_ticker
+    }
+
+def _ticker_impact(event_row, closes):
+    """
+    Normalizes one event out of a close matrix. Returns {ticker: ImpactSeries}.
     """
     event_time = event_row['date']
     event_name = event_row['event']
-    
+
     print(f"Analyzing impact for: {event_name} at {event_time} (UTC)")
-    
-    impact_data = {}
-    
-    for asset_name, ticker in config.ASSETS.items():
-        print(f"  Fetching data for {asset_name} ({ticker})...")
-        df = fetch_market_data(ticker, event_time)
-        
-        if df.empty:
-            continue
-            
-        # Normalize data
-        # Find the price closest to the event time to use as baseline
-        # We use 'Close' price
-        
-        # Ensure index is timezone aware/unaware matching event_time if needed.
-        # yfinance returns timezone-aware timestamps (usually America/New_York).
-        # FMP event_time is usually UTC (or we need to check). 
-        # Let's assume we need to handle timezone conversion.
-        
-        if df.index.tz is None:
-             # If data has no timezone, assume it's local time
-             pass
+
+    if closes.empty:
+        return {}
+
+    try:
+        with profiler.stage("normalize") as info:
+            impact = _impact_from_closes(closes, event_time)
+            info['rows'] = sum(len(df) for df in impact.values())
+        return impact
+    except Exception as e:
+        print(f"  Error normalizing data for {event_name}: {e}")
+        return {}
+
+def calculate_impact(event_row, market_data=None, closes=None):
+    """
+    Calculates the impact of an event on all configured assets.
+    Returns a dictionary of ImpactSeries, one for each asset, normalized to 0% at event time
+    (call .to_frame() on one for a DataFrame).
+    Already-fetched data can be passed in as market_data ({ticker: DataFrame}) or as a
+    close matrix covering the event window (see iter_impacts).
+    """
+    if closes is None and market_data is None:
+        # One grouped download for every configured ticker instead of one round-trip each
+        print(f"  Fetching data for {len(config.ASSETS)} assets...")
+        market_data = fetch_market_data_batch(list(config.ASSETS.values()), event_row['date'])
+
+    if closes is None:
+        closes = _close_matrix(market_data)
+
+    return _by_asset_name(_ticker_impact(event_row, closes))
+
+def priority_order(asset_names=None):
+    """
+    Asset names with the config.PRIORITY_GROUP members first, then the rest in config order.
+    """
+    asset_names = list(config.ASSETS) if asset_names is None else list(asset_names)
+    first = set(config.ASSET_GROUPS.get(config.PRIORITY_GROUP, []))
+    return [name for name in asset_names if name in first] + [name for name in asset_names if name not in first]
+
+def _stream_chunk(event_row, tickers):
+    """
+    Fetches and normalizes one chunk of tickers for an event. Returns {ticker: ImpactSeries}.
+    """
+    with profiler.stage("stream_chunk", tickers=len(tickers)) as info:
+        closes = _close_matrix(fetch_market_data_batch(tickers, event_row['date']))
+        impact = _impact_from_closes(closes, event_row['date']) if not closes.empty else {}
+        info['rows'] = sum(len(series) for series in impact.values())
+    store_impacts(event_row, impact, _fetched(tickers, closes))
+    return impact
+
+def iter_asset_impacts(event_row, workers=None):
+    """
+    Yields (asset_name, ImpactSeries) for one event as soon as each asset is ready,
+    so a chart can start drawing before the slowest ticker arrives.
+    Stored results come first, then the priority group (core assets) as one small
+    download, then the other assets in chunks of config.STREAM_CHUNK_SIZE fetched in
+    parallel and yielded in the order they finish. Assets without data are skipped.
+    """
+    workers = workers or config.YAHOO_MAX_CONCURRENT
+    names = priority_order()
+    tickers = list(dict.fromkeys(config.ASSETS[name] for name in names))
+    names_of = {}
+    for name in names:
+        names_of.setdefault(config.ASSETS[name], []).append(name)
+
+    stored = load_impacts(pd.DataFrame([event_row]), tickers)[event_row.name]
+    for ticker in tickers:
+        series = stored.get(ticker)
+        if series is not None and not series.empty:
+            for name in names_of[ticker]:
+                yield name, series
+
+    missing = [t for t in tickers if t not in stored]
+    if not missing:
+        return
+
+    first = set(config.ASSETS[name] for name in config.ASSET_GROUPS.get(config.PRIORITY_GROUP, []))
+    chunks = [[t for t in missing if t in first]]
+    rest = [t for t in missing if t not in first]
+    chunks += [rest[i:i + config.STREAM_CHUNK_SIZE] for i in range(0, len(rest), config.STREAM_CHUNK_SIZE)]
+    chunks = [chunk for chunk in chunks if chunk]
+
+    print(f"Streaming {len(missing)} assets for: {event_row['event']} at {event_row['date']} (UTC)")
+    # Everything downloads at once, but the priority chunk is always yielded first;
+    # the other chunks follow in the order they finish
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_stream_chunk, event_row, chunk) for chunk in chunks]
+        try:
+            for future in chain(futures[:1], as_completed(futures[1:])):
+                impact = future.result()
+                for ticker in tickers:
+                    if ticker in impact:
+                        for name in names_of[ticker]:
+                            yield name, impact[ticker]
+        finally:
+            for future in futures:
+                future.cancel()
+
+def plan_event_windows(calendar_df, merge_gap_minutes=None):
+    """
+    Merges the download windows of events on the same trading session when they
+    overlap or sit within merge_gap_minutes of each other.
+    Returns a list of spans: {'start', 'end', 'events': [calendar_df index labels]}, in time order.
+    """
+    if merge_gap_minutes is None:
+        merge_gap_minutes = config.MERGE_GAP_MINUTES
+
+    if calendar_df.empty:
+        return []
+
+    est = pytz.timezone('US/Eastern')
+    pre = timedelta(minutes=config.PRE_EVENT_MINUTES)
+    post = timedelta(minutes=config.POST_EVENT_MINUTES)
+    gap = timedelta(minutes=merge_gap_minutes)
+
+    dates = calendar_df['date'].map(_to_utc).sort_values(kind='stable')
+    sessions = dates.dt.tz_convert(est).dt.date
+
+    spans = []
+    for label, event_time in dates.items():
+        start_time, end_time = event_time - pre, event_time + post
+        current = spans[-1] if spans else None
+
+        if current and current['session'] == sessions[label] and start_time <= current['end'] + gap:
+            current['end'] = max(current['end'], end_time)
+            current['events'].append(label)
         else:
-            # Make sure event time matches the market data timezone
-            if event_time.tzinfo is None:
-                event_time_tz = event_time.tz_localize('UTC').tz_convert(df.index.tz)
-            else:
-                event_time_tz = event_time.tz_convert(df.index.tz)
-            
-        # Find the price at the exact minute the event happened
+            spans.append({'session': sessions[label], 'start': start_time, 'end': end_time, 'events': [label]})
+
+    return spans
+
+def _fetch_span(span, tickers):
+    """
+    Downloads one merged span and returns its close matrix.
+    """
+    print(f"\nFetching {len(tickers)} assets for {span['start']} - {span['end']} (UTC)...")
+    with profiler.stage("span_fetch", tickers=len(tickers)):
+        return _close_matrix(fetch_span_data(tickers, span['start'], span['end']))
+
+def iter_span_closes(calendar_df, workers=1, span_tickers=None):
+    """
+    Yields (span, closes) for every merged download span of calendar_df, in time order.
+    span_tickers(span) can narrow the tickers fetched for a span (default: all configured).
+    With workers > 1 all spans are submitted to a thread pool up front, and results
+    are still yielded in time order as soon as each one (and everything before it) is ready.
+    """
+    spans = plan_event_windows(calendar_df)
+    tickers = list(dict.fromkeys(config.ASSETS.values()))
+    if span_tickers is None:
+        span_tickers = lambda span: tickers
+
+    if len(spans) < len(calendar_df):
+        print(f"Merged {len(calendar_df)} event windows into {len(spans)} downloads.")
+
+    if workers <= 1 or len(spans) <= 1:
+        for span in spans:
+            yield span, _fetch_span(span, span_tickers(span))
+        return
+
+    # Downloads are I/O bound, so threads are enough; data_loader enforces
+    # the global Yahoo concurrency and rate limits across all of them
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fetch_span, span, span_tickers(span)) for span in spans]
         try:
-            idx_loc = df.index.get_indexer([event_time_tz], method='nearest')[0]
-            baseline_price = df.iloc[idx_loc]['Close']
-            
-            # Handle case where 'Close' is a Series (rare yfinance quirk)
-            if isinstance(baseline_price, pd.Series):
-                baseline_price = baseline_price.iloc[0]
-            
-            # Calculate percentage change: (Current Price - Baseline) / Baseline * 100
-            # This makes all assets start at 0% so we can compare them easily
-            
-            # Calculate minutes relative to event (e.g., -15, 0, +60)
-            minutes_relative = (df.index - event_time_tz).total_seconds() / 60
-            
-            pct_change = ((df['Close'] - baseline_price) / baseline_price) * 100
-            
-            # If pct_change is a DataFrame (yfinance quirk), squeeze it
-            if isinstance(pct_change, pd.DataFrame):
-                pct_change = pct_change.squeeze()
-            
-            asset_impact_df = pd.DataFrame({
-                'time': df.index,
-                'minutes_relative': minutes_relative,
-                'pct_change': pct_change
-            })
-            
-            impact_data[asset_name] = asset_impact_df
-            
-        except Exception as e:
-            print(f"  Error normalizing data for {asset_name}: {e}")
-            
-    return impact_data
+            for span, future in zip(spans, futures):
+                yield span, future.result()
+        finally:
+            # Stop queued spans if the caller quits early
+            for future in futures:
+                future.cancel()
+
+def _missing_impacts(calendar_df):
+    """
+    Returns (tickers, stored, missing): the configured tickers, the stored results per
+    event label and, per label, the tickers that still have to be fetched.
+    """
+    tickers = list(dict.fromkeys(config.ASSETS.values()))
+    stored = load_impacts(calendar_df, tickers)
+    missing = {label: [t for t in tickers if t not in stored[label]] for label in calendar_df.index}
+    return tickers, stored, missing
+
+def plan_fetches(calendar_df):
+    """
+    What iter_impacts would download for calendar_df, without downloading anything:
+    one dict per merged span with 'start', 'end', 'events', 'tickers' (those not
+    already stored) and the planned bar 'interval'. Spans with nothing to fetch are
+    included with an empty ticker list and no interval; spans that are too old for any
+    usable interval have tickers but no interval.
+    """
+    tickers, stored, missing = _missing_impacts(calendar_df)
+    plans = []
+    for span in plan_event_windows(calendar_df):
+        needed = set().union(*(missing[label] for label in span['events']))
+        span_tickers = [t for t in tickers if t in needed]
+        interval = plan_interval(span_tickers, span['start'], span['end']) if span_tickers else None
+        plans.append({**span, 'tickers': span_tickers, 'interval': interval})
+    return plans
+
+def iter_impacts(calendar_df, workers=1):
+    """
+    Yields (index, event_row, impact_data) for every event in calendar_df, in time order.
+    Results already stored for an event/asset (see impact_cache) are reused; only the
+    missing event x asset pairs are fetched. Each merged span is downloaded once and
+    the events inside it are sliced from memory.
+    """
+    tickers, stored, missing = _missing_impacts(calendar_df)
+    n_missing = sum(len(m) for m in missing.values())
+    profiler.count("impact_cache", hits=len(calendar_df) * len(tickers) - n_missing, misses=n_missing)
+
+    todo = calendar_df[[bool(missing[label]) for label in calendar_df.index]]
+    if len(todo) < len(calendar_df):
+        print(f"Reusing stored results for {len(calendar_df) - len(todo)} unchanged events.")
+
+    def span_tickers(span):
+        needed = set().union(*(missing[label] for label in span['events']))
+        return [t for t in tickers if t in needed]
+
+    spans = iter_span_closes(todo, workers, span_tickers)
+    computed = {}
+    try:
+        for label in calendar_df['date'].map(_to_utc).sort_values(kind='stable').index:
+            event_row = calendar_df.loc[label]
+            fresh = {}
+
+            if missing[label]:
+                # Pull spans until this event has been computed (spans come in time order)
+                while label not in computed:
+                    span, closes = next(spans)
+                    for span_label in span['events']:
+                        span_row = calendar_df.loc[span_label]
+                        computed[span_label] = _ticker_impact(span_row, closes)
+                        store_impacts(span_row, computed[span_label], _fetched(missing[span_label], closes))
+                fresh = computed.pop(label)
+            else:
+                print(f"Loaded stored impact for: {event_row['event']} at {event_row['date']} (UTC)")
+
+            held = {ticker: df for ticker, df in stored[label].items() if not df.empty}
+            yield label, event_row, _by_asset_name({**held, **fresh})
+    finally:
+        spans.close()
+
+def calculate_impacts(calendar_df, workers=1):
+    """
+    Calculates the impact of every event in calendar_df.
+    Returns {index: impact_data} in the same order as calendar_df.
+    """
+    results = {label: impact_data for label, _, impact_data in iter_impacts(calendar_df, workers)}
+    return {label: results[label] for label in calendar_df.index}
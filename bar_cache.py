@@ -0,0 +1,279 @@
+import os
+import sqlite3
+import threading
+import time
+import contextlib
+from datetime import datetime, timedelta
+import pandas as pd
+import pytz
+import config
+
+# Bars newer than this are not marked as "held", so a window that is still
+# filling in (or that Yahoo has not published yet) gets fetched again next time.
+SETTLE_MINUTES = 15
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (ticker, interval, ts)
+);
+CREATE INDEX IF NOT EXISTS bars_day ON bars (ticker, interval, day);
+
+-- Time ranges [start, end) we already asked Yahoo for, per ticker and interval
+CREATE TABLE IF NOT EXISTS coverage (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_key ON coverage (ticker, interval, start);
+
+-- Last time each trading day was read or written, used for eviction
+CREATE TABLE IF NOT EXISTS day_access (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    day TEXT NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (ticker, interval, day)
+);
+"""
+
+_EST = pytz.timezone('US/Eastern')
+
+
+def _to_epoch(ts):
+    """
+    Converts a datetime/Timestamp (naive = UTC) to integer epoch seconds.
+    """
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.timestamp())
+
+
+def _merge_ranges(ranges):
+    """
+    Merges overlapping or touching [start, end) ranges.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def _subtract_ranges(ranges, start, end):
+    """
+    Returns the parts of [start, end) not covered by the given (merged) ranges.
+    """
+    gaps = []
+    cursor = start
+    for r_start, r_end in ranges:
+        if r_end <= cursor:
+            continue
+        if r_start >= end:
+            break
+        if r_start > cursor:
+            gaps.append((cursor, r_start))
+        cursor = max(cursor, r_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class BarCache:
+    """
+    Local SQLite store of OHLCV bars keyed by ticker, interval and trading day.
+    Tracks which time ranges it holds so callers only download the gaps.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            # Must be set before the first table is created to take effect
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe to use from threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _coverage(self, conn, ticker, interval):
+        rows = conn.execute(
+            "SELECT start, end FROM coverage WHERE ticker = ? AND interval = ? ORDER BY start",
+            (ticker, interval)
+        ).fetchall()
+        return _merge_ranges(rows)
+
+    def missing_ranges(self, ticker, interval, start_time, end_time):
+        """
+        Returns the list of (start, end) UTC Timestamps in the window we do not hold yet.
+        """
+        start, end = _to_epoch(start_time), _to_epoch(end_time)
+        with self._connect() as conn:
+            gaps = _subtract_ranges(self._coverage(conn, ticker, interval), start, end)
+        return [(pd.Timestamp(s, unit='s', tz='UTC'), pd.Timestamp(e, unit='s', tz='UTC')) for s, e in gaps]
+
+    def load(self, ticker, interval, start_time, end_time):
+        """
+        Returns cached bars in [start_time, end_time) as a yfinance-shaped DataFrame (UTC index).
+        """
+        start, end = _to_epoch(start_time), _to_epoch(end_time)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT ts, open, high, low, close, volume, day FROM bars "
+                "WHERE ticker = ? AND interval = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (ticker, interval, start, end)
+            ).fetchall()
+
+            days = {row[6] for row in rows}
+            if days:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE day_access SET last_access = ? WHERE ticker = ? AND interval = ? AND day = ?",
+                    [(now, ticker, interval, day) for day in days]
+                )
+
+        if not rows:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(rows, columns=['ts', 'Open', 'High', 'Low', 'Close', 'Volume', 'day'])
+        df.index = pd.DatetimeIndex(pd.to_datetime(df['ts'], unit='s', utc=True), name='Datetime')
+        return df[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    def store(self, ticker, interval, df, start_time, end_time):
+        """
+        Saves downloaded bars and marks [start_time, end_time) as held.
+        Empty downloads are not recorded, so a transient failure is retried next time.
+        """
+        if df is None or df.empty:
+            return
+
+        # Never mark the still-settling tail of a recent window as complete
+        settled = datetime.now(pytz.utc) - timedelta(minutes=SETTLE_MINUTES)
+        start = _to_epoch(start_time)
+        end = min(_to_epoch(end_time), _to_epoch(settled))
+
+        index = df.index if df.index.tz is not None else df.index.tz_localize('UTC')
+        epochs = (index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        trading_days = index.tz_convert(_EST).strftime('%Y-%m-%d')
+
+        def column(name):
+            if name not in df.columns:
+                return [None] * len(df)
+            return [None if pd.isna(v) else float(v) for v in df[name].to_numpy()]
+
+        rows = list(zip(
+            [ticker] * len(df), [interval] * len(df), [int(e) for e in epochs], trading_days,
+            column('Open'), column('High'), column('Low'), column('Close'), column('Volume')
+        ))
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.executemany(
+                "INSERT OR REPLACE INTO day_access VALUES (?, ?, ?, ?)",
+                [(ticker, interval, day, now) for day in set(trading_days)]
+            )
+
+            if end > start:
+                merged = _merge_ranges(self._coverage(conn, ticker, interval) + [(start, end)])
+                conn.execute("DELETE FROM coverage WHERE ticker = ? AND interval = ?", (ticker, interval))
+                conn.executemany(
+                    "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+                    [(ticker, interval, s, e) for s, e in merged]
+                )
+
+        self.evict()
+
+    def size_bytes(self):
+        """
+        Returns the space used by live pages in the database file.
+        """
+        with self._connect() as conn:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def evict(self):
+        """
+        Drops the least recently used trading days until the cache fits in max_bytes.
+        """
+        if not self.max_bytes:
+            return
+
+        with self._lock:
+            while self.size_bytes() > self.max_bytes:
+                with self._connect() as conn:
+                    victims = conn.execute(
+                        "SELECT ticker, interval, day FROM day_access ORDER BY last_access LIMIT 20"
+                    ).fetchall()
+                    if not victims:
+                        break
+
+                    for ticker, interval, day in victims:
+                        self._drop_day(conn, ticker, interval, day)
+
+                    conn.execute("PRAGMA incremental_vacuum")
+
+    def _drop_day(self, conn, ticker, interval, day):
+        conn.execute(
+            "DELETE FROM bars WHERE ticker = ? AND interval = ? AND day = ?", (ticker, interval, day)
+        )
+        conn.execute(
+            "DELETE FROM day_access WHERE ticker = ? AND interval = ? AND day = ?", (ticker, interval, day)
+        )
+
+        # Forget that we hold this trading day, so it gets fetched again if needed
+        day_start = _EST.localize(datetime.strptime(day, '%Y-%m-%d'))
+        day_start, day_end = _to_epoch(day_start), _to_epoch(day_start + timedelta(days=1))
+
+        remaining = []
+        for start, end in self._coverage(conn, ticker, interval):
+            remaining.extend(
+                (s, e) for s, e in [(start, min(end, day_start)), (max(start, day_end), end)] if e > s
+            )
+        conn.execute("DELETE FROM coverage WHERE ticker = ? AND interval = ?", (ticker, interval))
+        conn.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?)", [(ticker, interval, s, e) for s, e in remaining]
+        )
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the shared BarCache, or None when caching is turned off (config.BAR_CACHE_MODE).
+    """
+    global _default_cache
+
+    if config.BAR_CACHE_MODE == 'off':
+        return None
+
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = BarCache(
+                os.path.join(config.CACHE_DIR, 'bars.sqlite'),
+                max_bytes=config.BAR_CACHE_MAX_MB * 1024 * 1024
+            )
+    return _default_cache
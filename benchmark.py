@@ -0,0 +1,352 @@
+"""
+Offline benchmark for the fetch -> analyze -> plot pipeline.
+
+Yahoo (yf.download) and the FMP session are swapped for deterministic local
+fakes that generate synthetic minute bars and calendars, with configurable
+latency and failure rate, so throughput can be measured with no network.
+
+    python benchmark.py                          # default scales
+    python benchmark.py --scale 1000x15 --scale 100x500 --latency-ms 50 --workers 8
+    python benchmark.py --scale 10000x15 --no-plot --json bench.jsonl
+    python benchmark.py --startup                # CLI start-up check, exits 1 on regression
+
+Each scale (EVENTSxASSETS) runs in its own subprocess so peak memory is per scale.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+
+DEFAULT_SCALES = ["10x15", "1000x15", "100x500"]
+
+# `main.py --list` must not load these, and must finish within the budget
+STARTUP_FORBIDDEN = ("yfinance", "plotly", "requests")
+STARTUP_BUDGET_SECONDS = 1.5
+
+# Runs in a fresh interpreter: times `import main` and a full `main.py --list`
+_STARTUP_SCRIPT = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+sys.argv = ["main.py", "--list"]
+with contextlib.redirect_stdout(io.StringIO()):
+    main.main()
+print(json.dumps({
+    "import_s": imported,
+    "list_s": time.perf_counter() - started,
+    "loaded": [name for name in %r if name in sys.modules]
+}))
+"""
+
+# Release times used for synthetic events (UTC), several per session like a real calendar
+_RELEASE_TIMES = [(12, 30), (14, 0), (18, 0)]
+
+class FakeYahoo:
+    """
+    Stand-in for yf.download. Bars are a random walk seeded by ticker and window,
+    so the same request always returns the same data.
+    """
+
+    def __init__(self, latency_ms=0, failure_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _failed(self):
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def _bars(self, ticker, index):
+        seed = zlib.crc32(f"{ticker}|{index[0] if len(index) else ''}".encode())
+        rng = np.random.default_rng(seed)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, len(index))))
+        return pd.DataFrame({
+            'Open': close, 'High': close * 1.0002, 'Low': close * 0.9998,
+            'Close': close, 'Volume': rng.integers(1000, 5000, len(index)).astype(float)
+        }, index=index)
+
+    def download(self, tickers, start=None, end=None, interval="1m", group_by='column',
+                 multi_level_index=True, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        step = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60}.get(interval, 1)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+        end = end.tz_localize('UTC') if end.tzinfo is None else end.tz_convert('UTC')
+        index = pd.date_range(start.ceil(f"{step}min"), end, freq=f"{step}min", inclusive='left', name='Datetime')
+
+        if isinstance(tickers, str):
+            if self._failed():
+                return pd.DataFrame()
+            df = self._bars(tickers, index)
+            if multi_level_index:
+                df.columns = pd.MultiIndex.from_product([[tickers], df.columns])
+            return df
+
+        frames = {}
+        for ticker in tickers:
+            df = self._bars(ticker, index)
+            if self._failed():
+                # yfinance leaves failed tickers as all-NaN columns in a grouped download
+                df[:] = np.nan
+            frames[ticker] = df
+        return pd.concat(frames, axis=1)
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.content = json.dumps(payload).encode()
+        self.text = self.content.decode()
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class FakeFMP:
+    """
+    Stand-in for the FMP client's requests.Session.
+    Serves n_events synthetic high-impact USD releases spread over past sessions,
+    filtered to the requested from/to dates like the real endpoint.
+    """
+
+    def __init__(self, n_events, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self.events = synthetic_calendar(n_events)
+        self._lock = threading.Lock()
+
+    def date_range(self):
+        days = sorted(event['date'][:10] for event in self.events)
+        return days[0], days[-1]
+
+    def get(self, url, params=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        params = params or {}
+        start, end = params.get('from', '0000-00-00'), params.get('to', '9999-99-99')
+        return _FakeResponse([event for event in self.events if start <= event['date'][:10] <= end])
+
+def synthetic_calendar(n_events):
+    """
+    n_events FMP-style records on past weekdays, up to three releases per session.
+    """
+    import config
+
+    names = config.IMPORTANT_EVENTS
+    per_day = len(_RELEASE_TIMES)
+    day = datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+
+    events = []
+    while len(events) < n_events:
+        if day.weekday() < 5:
+            for hour, minute in _RELEASE_TIMES[:min(per_day, n_events - len(events))]:
+                events.append({
+                    'event': names[len(events) % len(names)],
+                    'date': day.replace(hour=hour, minute=minute).strftime('%Y-%m-%d %H:%M:%S'),
+                    'currency': 'USD',
+                    'impact': 'High',
+                    'actual': f"{random.Random(len(events)).uniform(0, 5):.1f}%",
+                    'estimate': '2.5%',
+                    'previous': '2.4%',
+                })
+        day -= timedelta(days=1)
+    return events
+
+def synthetic_assets(n_assets):
+    return {f"Asset {i:03d}": f"SYN{i:03d}" for i in range(n_assets)}
+
+def peak_memory_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_scale(n_events, n_assets, latency_ms, failure_rate, workers, plot, use_cache, rate_limit=False):
+    """
+    Runs the real pipeline once against the fakes and returns a result dict.
+    events_per_sec only counts events that came back with data.
+    """
+    import config
+    import profiler
+    import data_loader
+    import fmp_client
+    from throttle import RateLimiter
+    from analyzer import iter_impacts
+    from visualizer import plot_event_impact
+
+    config.CACHE_DIR = tempfile.mkdtemp(prefix="macro_bench_")
+    config.BAR_CACHE_MODE = "use" if use_cache else "off"
+    config.ASSETS = synthetic_assets(n_assets)
+    # The fake serves every interval for any date; without this the planner would mark the
+    # synthetic history (over a year back at 1k events) unavailable and skip it unfetched
+    config.PROVIDER_RETENTION_DAYS = {interval: float('inf') for interval in config.PROVIDER_RETENTION_DAYS}
+
+    yahoo = FakeYahoo(latency_ms, failure_rate)
+    fmp = FakeFMP(n_events, latency_ms)
+    data_loader._yfinance().download = yahoo.download
+    fmp_client._session = fmp
+    if not rate_limit:
+        # The real Yahoo throttle would make every run measure config.YAHOO_TICKERS_PER_SECOND
+        data_loader._yahoo_rate = RateLimiter(1e9, burst=1e9)
+
+    profiler.enable()
+    started = time.perf_counter()
+    events_done = 0
+
+    # The pipeline is chatty; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_date, end_date = fmp.date_range()
+        calendar_df = data_loader.fetch_economic_calendar(start_date, end_date, api_key="benchmark")
+        for index, row, impact_data in iter_impacts(calendar_df, workers=workers):
+            if not impact_data:
+                continue
+            if plot:
+                plot_event_impact(row, impact_data)
+            events_done += 1
+
+    elapsed = time.perf_counter() - started
+    stages = profiler.summary()
+
+    return {
+        'events': n_events,
+        'with_data': events_done,
+        'assets': n_assets,
+        'workers': workers,
+        'latency_ms': latency_ms,
+        'failure_rate': failure_rate,
+        'plot': plot,
+        'seconds': round(elapsed, 3),
+        'events_per_sec': round(events_done / elapsed, 2) if elapsed else None,
+        'peak_mb': round(peak_memory_mb(), 1),
+        'yahoo_calls': yahoo.calls,
+        'fmp_calls': fmp.calls,
+        'stages': {name: round(row['total_s'], 3) for name, row in stages.iterrows()},
+    }
+
+def parse_scale(text):
+    events, _, assets = text.lower().partition('x')
+    return int(events), int(assets or 15)
+
+def check_startup(runs=3):
+    """
+    Runs `main.py --list` on the bundled events.csv in fresh interpreters (no API key,
+    empty cache) and checks the heavy stacks stay unloaded and the best run is within
+    STARTUP_BUDGET_SECONDS. Returns True when both hold.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = {**os.environ, "FMP_API_KEY": "", "MACRO_CACHE_DIR": cache_dir}
+        results = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-c", _STARTUP_SCRIPT % (STARTUP_FORBIDDEN,)],
+                cwd=root, env=env, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(completed.stderr)
+                return False
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result["process_s"] = time.perf_counter() - started
+            results.append(result)
+
+    best = min(results, key=lambda r: r["process_s"])
+    loaded = sorted(set().union(*(r["loaded"] for r in results)))
+    print(f"import main: {best['import_s']:.2f}s | main.py --list: {best['list_s']:.2f}s "
+          f"| whole process: {best['process_s']:.2f}s (budget {STARTUP_BUDGET_SECONDS:.2f}s)")
+
+    ok = True
+    if loaded:
+        print(f"FAIL: --list imported {', '.join(loaded)}")
+        ok = False
+    if best["process_s"] > STARTUP_BUDGET_SECONDS:
+        print("FAIL: start-up is over budget")
+        ok = False
+    if ok:
+        print("OK")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark (no network)")
+    parser.add_argument("--scale", action="append", help="EVENTSxASSETS, e.g. 1000x15 (repeatable)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated latency per Yahoo/FMP call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Chance that a ticker download fails")
+    parser.add_argument("--workers", type=int, default=1, help="Workers passed to iter_impacts")
+    parser.add_argument("--no-plot", action="store_true", help="Skip plot_event_impact")
+    parser.add_argument("--cache", action="store_true", help="Run with the bar/impact caches on (in a temp dir)")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the Yahoo rate limit from config")
+    parser.add_argument("--json", type=str, help="Append results to this JSON lines file")
+    parser.add_argument("--startup", action="store_true", help="Only check CLI start-up time and lazy imports")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(0 if check_startup() else 1)
+
+    scales = args.scale or DEFAULT_SCALES
+
+    if args.single:
+        n_events, n_assets = parse_scale(scales[0])
+        result = run_scale(n_events, n_assets, args.latency_ms, args.failure_rate,
+                           args.workers, not args.no_plot, args.cache, args.rate_limit)
+        print(json.dumps(result))
+        return
+
+    # One subprocess per scale, so peak memory isn't carried over between runs
+    results = []
+    for scale in scales:
+        command = [sys.executable, os.path.abspath(__file__), "--single", "--scale", scale,
+                   "--latency-ms", str(args.latency_ms), "--failure-rate", str(args.failure_rate),
+                   "--workers", str(args.workers)]
+        if args.no_plot:
+            command.append("--no-plot")
+        if args.cache:
+            command.append("--cache")
+        if args.rate_limit:
+            command.append("--rate-limit")
+
+        print(f"Running {scale}...", flush=True)
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr)
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        return
+
+    table = pd.DataFrame(results)
+    print("\n--- Benchmark ---")
+    print(table[['events', 'with_data', 'assets', 'workers', 'seconds', 'events_per_sec', 'peak_mb', 'yahoo_calls']].to_string(index=False))
+
+    print("\n--- Time per stage (s) ---")
+    stages = pd.DataFrame([r['stages'] for r in results], index=[f"{r['events']}x{r['assets']}" for r in results])
+    print(stages.T.fillna(0).to_string())
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps({'at': datetime.now(pytz.utc).isoformat(), **result}) + "\n")
+
+if __name__ == "__main__":
+    main()
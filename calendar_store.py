@@ -0,0 +1,93 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import config
+
+# One .npy file per column in a directory; reads memory-map them, so a date-range
+# lookup only touches the rows it returns.
+# Versioned: calendars compiled before fall-back times were fixed to standard time
+# no longer count as compiled and are read from the CSV until rebuilt
+_COLUMNS_FILE = '_columns_v2.npy'
+# Row labels from the source file, so events keep the same index either way
+_ROW_COLUMN = '_row'
+_NA_SUFFIX = '.na'
+
+def compiled_path():
+    return os.path.join(config.CACHE_DIR, 'calendar')
+
+def is_fresh(source_file, path=None):
+    """
+    True if a compiled calendar exists and is newer than the file it was built from.
+    """
+    path = path or compiled_path()
+    columns_file = os.path.join(path, _COLUMNS_FILE)
+    return os.path.exists(columns_file) and os.path.getmtime(columns_file) >= os.path.getmtime(source_file)
+
+def _save(directory, name, values):
+    np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=False)
+
+def write_compiled(calendar_df, path=None):
+    """
+    Saves a normalized calendar (UTC 'date' column) column by column, sorted by date.
+    Dates are int64 nanoseconds; text columns are fixed-width strings plus a
+    missing-value mask, so nothing needs pickle to load.
+    Returns the number of events written.
+    """
+    path = path or compiled_path()
+    df = calendar_df.sort_values('date', kind='stable')
+
+    # Build next to the target and swap in, so a reader never sees half a calendar
+    building = path + '.tmp'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    _save(building, _ROW_COLUMN, df.index.to_numpy(dtype=np.int64))
+    for column in df.columns:
+        values = df[column]
+        if column == 'date':
+            utc = values.dt.tz_convert('UTC').dt.tz_localize(None)
+            _save(building, column, utc.to_numpy().astype('datetime64[ns]').view(np.int64))
+        elif pd.api.types.is_numeric_dtype(values):
+            _save(building, column, values.to_numpy())
+        else:
+            _save(building, column, values.fillna('').astype(str).to_numpy(dtype=str))
+            _save(building, column + _NA_SUFFIX, values.isna().to_numpy())
+    # Written last: its presence and mtime mark a complete calendar
+    _save(building, _COLUMNS_FILE[:-4], np.array(list(df.columns), dtype=str))
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(building, path)
+    return len(df)
+
+def read_compiled(start=None, end=None, path=None):
+    """
+    Loads the events with start <= date <= end from a compiled calendar.
+    Both bounds are found with a binary search on the sorted date column.
+    Returns None if there is no compiled calendar.
+    """
+    path = path or compiled_path()
+    columns_file = os.path.join(path, _COLUMNS_FILE)
+    if not os.path.exists(columns_file):
+        return None
+
+    def column(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+
+    dates = column('date')
+    lo = np.searchsorted(dates, pd.Timestamp(start).value, side='left') if start is not None else 0
+    hi = np.searchsorted(dates, pd.Timestamp(end).value, side='right') if end is not None else len(dates)
+
+    data = {}
+    for name in np.load(columns_file, allow_pickle=False).tolist():
+        if name == 'date':
+            data[name] = pd.to_datetime(np.array(dates[lo:hi]), utc=True)
+        elif os.path.exists(os.path.join(path, f"{name}{_NA_SUFFIX}.npy")):
+            values = np.array(column(name)[lo:hi]).astype(object)
+            values[column(name + _NA_SUFFIX)[lo:hi]] = np.nan
+            data[name] = values
+        else:
+            data[name] = np.array(column(name)[lo:hi])
+
+    return pd.DataFrame(data).set_axis(pd.Index(np.array(column(_ROW_COLUMN)[lo:hi])), axis=0)
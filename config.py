@@ -29,10 +29,103 @@ ASSETS = {
     "Comm. Svcs": "XLC"     # Communication (Google, Meta)
 }
 
+# Named groups of ASSETS (chart buttons, cross-sectional stats)
+ASSET_GROUPS = {
+    "Core": ["Equities", "FX", "Rates", "Volatility"],
+    "Sectors": ["Tech", "Financials", "Healthcare", "Cons. Disc", "Cons. Staples", "Energy",
+                "Utilities", "Industrials", "Materials", "Real Estate", "Comm. Svcs"],
+}
+
+# Progressive charts (--stream): this group is fetched and drawn first,
+# the remaining assets follow in parallel chunks of STREAM_CHUNK_SIZE tickers
+PRIORITY_GROUP = "Core"
+STREAM_CHUNK_SIZE = 4
+STREAM_POLL_SECONDS = 0.5
+
+# Charts switch from SVG to WebGL above this many points (all lines) or lines,
+# and each line is thinned to at most CHART_POINTS_PER_TRACE points
+CHART_WEBGL_POINTS = 20000
+CHART_WEBGL_TRACES = 40
+CHART_POINTS_PER_TRACE = 1500
+
+# Large universes ('python main.py universe --universe FILE'): tickers are fetched in
+# chunks sized so one chunk's bars stay under the memory budget, and results are
+# reduced to per-group statistics as each chunk arrives.
+UNIVERSE_MEMORY_MB = 64
+UNIVERSE_MAX_CHUNK = 100        # tickers per grouped Yahoo request at most
+UNIVERSE_TOP_N = 10             # top/bottom movers kept per event
+UNIVERSE_RANK_MINUTE = 15       # movers are ranked by their move this many minutes after release
+
+# Lead-lag analysis ('python main.py lead-lag'): cross-correlations of post-release
+# 1-minute returns at lags up to LEAD_LAG_MAX_MINUTES. A path takes part only if it moved
+# on at least LEAD_LAG_MIN_RETURNS minutes; events are processed in FFT blocks of this size
+LEAD_LAG_MAX_MINUTES = 10
+LEAD_LAG_MIN_RETURNS = 20
+LEAD_LAG_EVENT_BLOCK = 256
+
+# Surprise studies ('python main.py surprise'): surprise = actual - estimate, divided by the
+# root mean square surprise of that event type. Buckets map a name to the upper edge of its
+# standardized surprise range; event types need SURPRISE_MIN_EVENTS parsed surprises
+SURPRISE_BUCKETS = {
+    "Well below": -1.0,
+    "Below": -0.25,
+    "In line": 0.25,
+    "Above": 1.0,
+    "Well above": float("inf"),
+}
+SURPRISE_MIN_EVENTS = 3
+
 # Impact Window (minutes)
 PRE_EVENT_MINUTES = 15
 POST_EVENT_MINUTES = 60
 
+# Events on the same session whose windows are this close (minutes) share one download
+MERGE_GAP_MINUTES = 30
+
+# Live mode: seconds between polls, and how long to keep polling after the window ends
+LIVE_POLL_SECONDS = 15
+LIVE_GRACE_MINUTES = 5
+
+# Query service ('python main.py serve'): one warm process shared by several users.
+# Calendars, impacts and charts stay in memory (LRU) for the TTL; identical requests
+# arriving together share one computation
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 8             # threads for downloads, analysis and rendering
+SERVICE_CACHE_ENTRIES = 256
+SERVICE_CACHE_TTL_MINUTES = 15
+
+# Yahoo Finance politeness limits (shared by all worker threads)
+YAHOO_MAX_CONCURRENT = 4        # downloads in flight at once
+YAHOO_TICKERS_PER_SECOND = 20   # sustained ticker requests per second
+YAHOO_TICKERS_BURST = 60        # short bursts allowed above that rate
+
+# FMP calendar client: long ranges are fetched as parallel chunks of this many days.
+# Responses are cached under CACHE_DIR; chunks touching today or later expire after the TTL.
+FMP_CHUNK_DAYS = 30
+FMP_MAX_CONCURRENT = 4
+FMP_RETRIES = 4                 # retries on 429/5xx/connection errors, with backoff
+FMP_TIMEOUT_SECONDS = 15
+FMP_CACHE_TTL_MINUTES = 60
+
+# Finest bar interval we analyze. Older windows are planned at the finest interval
+# Yahoo still serves (or the local cache still holds) before anything is fetched.
+BAR_INTERVAL = "1m"
+
+# How many days back Yahoo keeps each intraday interval
+PROVIDER_RETENTION_DAYS = {"1m": 29, "5m": 59, "15m": 59, "1h": 729}
+
+# Fewest bars an interval must leave after the release (POST_EVENT_MINUTES of them);
+# windows with no such interval left are reported as unavailable, not as "no move"
+MIN_POST_EVENT_BARS = 6
+
+# Local minute-bar cache (also covers stored per-event impact results)
+# "use" serves held windows from disk and only downloads the gaps,
+# "refresh" re-downloads and overwrites, "off" bypasses the cache entirely.
+CACHE_DIR = os.getenv("MACRO_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+BAR_CACHE_MODE = "use"
+BAR_CACHE_MAX_MB = 512
+
 # Important Events to Filter (ForexFactory naming convention)
 IMPORTANT_EVENTS = [
     "CPI",
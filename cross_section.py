@@ -0,0 +1,235 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import config
+import profiler
+from analyzer import plan_event_windows, normalize_window, _close_matrix
+from data_loader import fetch_span_data
+from event_study import minute_grid, _place
+from universe import load_universe
+
+# Rough in-memory cost of one downloaded bar for one ticker: the OHLCV frame,
+# its Close column in the close matrix and the normalized window, with pandas overhead
+_BYTES_PER_BAR = 160
+
+class CrossSection:
+    """
+    Cross-sectional statistics of one event's reaction across a universe.
+
+    Assets are added a chunk at a time. Per group and minute only the count, sum
+    and sum of squares are kept, plus the current top/bottom movers, so memory
+    does not depend on how many assets the universe has.
+    """
+
+    def __init__(self, event_row, groups, minutes, top_n=None, rank_minute=None):
+        self.event_row = event_row
+        self.groups = list(groups)
+        self.minutes = np.asarray(minutes)
+        self.top_n = config.UNIVERSE_TOP_N if top_n is None else top_n
+        self.rank_minute = config.UNIVERSE_RANK_MINUTE if rank_minute is None else rank_minute
+
+        shape = (len(self.groups), len(self.minutes))
+        self._count = np.zeros(shape, dtype=np.int64)
+        self._sum = np.zeros(shape)
+        self._sumsq = np.zeros(shape)
+        self._mover_names = np.array([], dtype=object)
+        self._mover_moves = np.array([], dtype=float)
+        self.assets = 0
+
+    def __repr__(self):
+        return f"CrossSection({self.event_row['event']}, {self.assets} assets x {len(self.groups)} groups)"
+
+    def add(self, values, names, membership):
+        """
+        Folds in one chunk: values is (asset, minute) on the minute grid (NaN = no bar),
+        membership the (asset, group) matrix from Universe.membership(names).
+        """
+        has_bar = ~np.isnan(values)
+        filled = np.where(has_bar, values, 0.0)
+        weights = membership.T.astype(float)
+
+        self._count += membership.T.astype(np.int64) @ has_bar.astype(np.int64)
+        self._sum += weights @ filled
+        self._sumsq += weights @ (filled * filled)
+        self.assets += int(has_bar.any(axis=1).sum())
+
+        self._update_movers(values, has_bar, np.asarray(names, dtype=object))
+
+    def _update_movers(self, values, has_bar, names):
+        """
+        Keeps only the top_n biggest and smallest moves at rank_minute seen so far.
+        """
+        col = np.searchsorted(self.minutes, self.rank_minute, side='right') - 1
+        if col < 0:
+            return
+
+        # Last bar at or before the ranking minute (handles 5m bars and gaps)
+        last = np.where(has_bar[:, :col + 1], np.arange(col + 1), -1).max(axis=1)
+        ranked = last >= 0
+        moves = values[ranked, last[ranked]]
+
+        names = np.concatenate([self._mover_names, names[ranked]])
+        moves = np.concatenate([self._mover_moves, moves])
+        if len(moves) > 2 * self.top_n:
+            order = np.argsort(moves, kind='stable')
+            keep = np.concatenate([order[:self.top_n], order[-self.top_n:]])
+            names, moves = names[keep], moves[keep]
+        self._mover_names, self._mover_moves = names, moves
+
+    def count(self):
+        """
+        Assets with a bar, per (group, minute).
+        """
+        return self._count
+
+    def mean(self):
+        """
+        Average move across each group's assets, shape (group, minute).
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._count > 0, self._sum / self._count, np.nan)
+
+    def dispersion(self):
+        """
+        Cross-sectional standard deviation within each group, shape (group, minute).
+        """
+        mean = self.mean()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(self._count > 0, self._sumsq / self._count - mean * mean, np.nan)
+        # Rounding can push a zero variance slightly negative
+        return np.sqrt(np.clip(variance, 0, None))
+
+    def top_movers(self):
+        """
+        Biggest moves at rank_minute: DataFrame(asset, move), largest first.
+        """
+        order = np.argsort(-self._mover_moves, kind='stable')[:self.top_n]
+        return pd.DataFrame({'asset': self._mover_names[order], 'move': self._mover_moves[order]})
+
+    def bottom_movers(self):
+        """
+        Most negative moves at rank_minute: DataFrame(asset, move), smallest first.
+        """
+        order = np.argsort(self._mover_moves, kind='stable')[:self.top_n]
+        return pd.DataFrame({'asset': self._mover_names[order], 'move': self._mover_moves[order]})
+
+    def at(self, minute):
+        """
+        Per-group count, mean and dispersion at one minute after release, taken from
+        each group's last minute with data at or before it (5m bars, gaps).
+        """
+        col = np.searchsorted(self.minutes, minute, side='right') - 1
+        has_data = self._count[:, :max(col, 0) + 1] > 0
+        last = np.where(has_data, np.arange(has_data.shape[1]), -1).max(axis=1)
+        rows = np.arange(len(self.groups))
+        found = (last >= 0) & (col >= 0)
+        pick = lambda stat: np.where(found, stat[rows, np.maximum(last, 0)], np.nan)
+        return pd.DataFrame({
+            'n': np.where(found, self._count[rows, np.maximum(last, 0)], 0),
+            'mean': pick(self.mean()),
+            'dispersion': pick(self.dispersion())
+        }, index=pd.Index(self.groups, name='group'))
+
+    def to_frame(self):
+        """
+        Long-format table: group, minutes_relative, n, mean, dispersion.
+        """
+        n_groups, n_minutes = self._count.shape
+        return pd.DataFrame({
+            'group': np.repeat(self.groups, n_minutes),
+            'minutes_relative': np.tile(self.minutes, n_groups),
+            'n': self._count.ravel(),
+            'mean': self.mean().ravel(),
+            'dispersion': self.dispersion().ravel()
+        })
+
+def chunk_size(span, n_assets):
+    """
+    How many tickers one download chunk may hold so its bars fit in config.UNIVERSE_MEMORY_MB.
+    Assumes 1m bars over the whole span (the worst case).
+    """
+    span_minutes = (span['end'] - span['start']).total_seconds() / 60
+    per_ticker = (span_minutes + 1) * _BYTES_PER_BAR
+    fits = int(config.UNIVERSE_MEMORY_MB * 1024 * 1024 // per_ticker)
+    return max(1, min(fits, config.UNIVERSE_MAX_CHUNK, n_assets))
+
+def _fetch_chunk(span, tickers):
+    with profiler.stage("universe_chunk", tickers=len(tickers)):
+        return _close_matrix(fetch_span_data(tickers, span['start'], span['end']))
+
+def _iter_chunks(span, chunks, universe, workers):
+    """
+    Yields (names, closes) per chunk. At most `workers` chunks are downloaded or held
+    at once, so memory stays at about workers x one chunk.
+    """
+    tickers = [[universe.assets[name] for name in names] for names in chunks]
+    if workers <= 1:
+        for names, chunk_tickers in zip(chunks, tickers):
+            yield names, _fetch_chunk(span, chunk_tickers)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for i, names in enumerate(chunks):
+            pending.append((names, pool.submit(_fetch_chunk, span, tickers[i])))
+            if len(pending) >= workers:
+                names, future = pending.pop(0)
+                yield names, future.result()
+        for names, future in pending:
+            yield names, future.result()
+
+def iter_cross_sections(calendar_df, universe=None, workers=1, minutes=None, top_n=None):
+    """
+    Yields (index, event_row, CrossSection) for every event in calendar_df, in time order.
+    Each merged download span is fetched in ticker chunks (see chunk_size); every
+    chunk is normalized per event, folded into the running statistics and dropped.
+    top_n is the number of top/bottom movers kept (default config.UNIVERSE_TOP_N).
+    """
+    universe = universe or load_universe()
+    if minutes is None:
+        minutes = minute_grid()
+
+    names = universe.names
+    for span in plan_event_windows(calendar_df):
+        rows = {label: calendar_df.loc[label] for label in span['events']}
+        sections = {label: CrossSection(row, universe.groups, minutes, top_n) for label, row in rows.items()}
+
+        size = chunk_size(span, len(names))
+        chunks = [names[i:i + size] for i in range(0, len(names), size)]
+        print(f"\nFetching {len(names)} assets for {span['start']} - {span['end']} (UTC) "
+              f"in {len(chunks)} chunks of up to {size}...")
+
+        for chunk_names, closes in _iter_chunks(span, chunks, universe, workers):
+            membership = universe.membership(chunk_names)
+            chunk_tickers = [universe.assets[name] for name in chunk_names]
+            for label, section in sections.items():
+                values = np.full((len(chunk_names), len(minutes)), np.nan)
+                if not closes.empty:
+                    pct_change, minutes_relative = normalize_window(closes, rows[label]['date'])
+                    # One row per asset in chunk order, NaN for tickers without bars
+                    pct_change = pct_change.reindex(columns=chunk_tickers)
+                    _place(values, pct_change.to_numpy(dtype=float).T, minutes_relative, minutes)
+                section.add(values, chunk_names, membership)
+            del closes
+
+        for label in span['events']:
+            yield label, rows[label], sections[label]
+
+def print_cross_section(section, horizons=(1, 5, 15, 60)):
+    """
+    Prints per-group mean and dispersion at each horizon, then the top/bottom movers.
+    """
+    row = section.event_row
+    print(f"\n--- {row['event']} ({row['date']} UTC): {section.assets} assets with data ---")
+
+    table = pd.concat(
+        {f"+{h}m": section.at(h)[['mean', 'dispersion']] for h in horizons if h <= section.minutes[-1]},
+        axis=1
+    )
+    table.insert(0, 'assets', section.count().max(axis=1))
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(table.to_string())
+        print(f"\nTop movers at +{section.rank_minute}m (%):")
+        print(section.top_movers().to_string(index=False))
+        print(f"\nBottom movers at +{section.rank_minute}m (%):")
+        print(section.bottom_movers().to_string(index=False))
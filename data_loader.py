@@ -1,13 +1,27 @@
+import numpy as np
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 import pytz
 import config
 import os
-import requests
 import json
+import re
+import functools
 import contextlib
 import io
+import sys
+import threading
+import logging
+import bar_cache
+import calendar_store
+import fmp_client
+import profiler
+from throttle import RateLimiter
+
+# Rows per chunk when reading events.csv, so a multi-year file is never parsed all at once
+CSV_CHUNK_ROWS = 100_000
+
+EVENTS_CSV = os.path.join(os.path.dirname(__file__), 'events.csv')
 
 def fetch_from_fmp(api_key, start_date=None, end_date=None):
     """
@@ -18,59 +32,149 @@ def fetch_from_fmp(api_key, start_date=None, end_date=None):
     if not end_date:
         end_date = (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
         
-    url = f"https://financialmodelingprep.com/api/v3/economic_calendar?from={start_date}&to={end_date}&apikey={api_key}"
-    
     print(f"Fetching from FMP API ({start_date} to {end_date})...")
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        raise Exception(f"API Error: {response.status_code} - {response.text}")
-        
-    data = response.json()
+    data = fmp_client.fetch_calendar(api_key, start_date, end_date)
     
     if not data:
         return pd.DataFrame()
         
-    df = pd.DataFrame(data)
-    
-    # Rename columns to match our schema
-    # FMP returns: event, date, country, impact, actual, estimate, previous
+    # FMP returns: event, date, country/currency, impact, actual, estimate, previous (dates in UTC)
+    return normalize_calendar(pd.DataFrame(data))
+
+def _localize_eastern(naive):
+    """
+    US/Eastern wall-clock times -> UTC for a whole column at once, DST-aware.
+    Matches the old row-by-row est.localize() (is_dst=False): repeated fall-back
+    times take the second (standard time) occurrence, and times inside the
+    spring-forward gap move ahead an hour.
+    """
+    return naive.dt.tz_localize(
+        'US/Eastern',
+        ambiguous=np.zeros(len(naive), dtype=bool),
+        nonexistent=pd.Timedelta(hours=1)
+    ).dt.tz_convert('UTC')
+
+def normalize_calendar(df, local_tz=None):
+    """
+    Brings raw calendar rows from either source to one schema: a 'country' column,
+    a UTC 'date' column (CSV 'date' + 'time' are combined), lowercase 'impact'
+    and an 'actual' column. local_tz is 'US/Eastern' for CSV times, None for UTC.
+    """
     df = df.rename(columns={'currency': 'country'})
-    
-    # Parse date
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Convert to UTC (FMP dates are usually UTC, but let's ensure)
-    if df['date'].dt.tz is None:
-        df['date'] = df['date'].dt.tz_localize('UTC')
+
+    if 'time' in df.columns:
+        dates = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str), format='%Y-%m-%d %H:%M')
     else:
-        df['date'] = df['date'].dt.tz_convert('UTC')
-        
+        dates = pd.to_datetime(df['date'])
+
+    if dates.dt.tz is not None:
+        df['date'] = dates.dt.tz_convert('UTC')
+    elif local_tz:
+        df['date'] = _localize_eastern(dates)
+    else:
+        df['date'] = dates.dt.tz_localize('UTC')
+
+    if 'impact' in df.columns:
+        df['impact'] = df['impact'].str.lower()
+
+    # Filled in after the release
+    if 'actual' not in df.columns:
+        df['actual'] = 'Wait for release'
     return df
 
+@functools.lru_cache(maxsize=8)
+def _event_name_pattern(names):
+    return re.compile('|'.join(re.escape(name) for name in names), re.IGNORECASE)
+
+def filter_important(df):
+    """
+    Keeps high-impact events and any event named in IMPORTANT_EVENTS,
+    in the currencies we track.
+    """
+    if df.empty:
+        return df
+
+    mask_impact = df['impact'].eq('high') if 'impact' in df.columns else True
+    if config.IMPORTANT_EVENTS:
+        pattern = _event_name_pattern(tuple(config.IMPORTANT_EVENTS))
+        mask_name = df['event'].astype(str).str.contains(pattern, na=False)
+    else:
+        mask_name = False
+    mask_currency = df['country'].isin(config.IMPORTANT_CURRENCIES)
+
+    return df[(mask_impact | mask_name) & mask_currency].copy()
+
+def _date_bounds(start_date=None, end_date=None):
+    """
+    UTC bounds for an inclusive 'YYYY-MM-DD' range: the end date counts up to its last instant.
+    """
+    start_dt = pd.to_datetime(start_date).tz_localize(pytz.utc) if start_date else None
+    end_dt = pd.to_datetime(end_date).tz_localize(pytz.utc) + pd.Timedelta(days=1) - pd.Timedelta(1) if end_date else None
+    return start_dt, end_dt
+
+def read_calendar_csv(csv_file=EVENTS_CSV, start_date=None, end_date=None):
+    """
+    Reads and normalizes events.csv chunk by chunk.
+    With a date range, rows are first dropped on the raw 'date' text (ISO dates
+    sort as strings; one spare day each side covers the Eastern -> UTC shift),
+    so only rows near the range are ever parsed.
+    """
+    start_dt, end_dt = _date_bounds(start_date, end_date)
+    low = (start_dt - timedelta(days=1)).strftime('%Y-%m-%d') if start_dt is not None else None
+    high = (end_dt + timedelta(days=1)).strftime('%Y-%m-%d') if end_dt is not None else None
+
+    chunks = []
+    for chunk in pd.read_csv(csv_file, chunksize=CSV_CHUNK_ROWS, dtype={'date': str, 'time': str}):
+        if low:
+            chunk = chunk[chunk['date'] >= low]
+        if high:
+            chunk = chunk[chunk['date'] <= high]
+        if not chunk.empty:
+            chunks.append(normalize_calendar(chunk, local_tz='US/Eastern'))
+
+    if not chunks:
+        return pd.DataFrame()
+
+    df = pd.concat(chunks)
+    if start_dt is not None:
+        df = df[df['date'] >= start_dt]
+    if end_dt is not None:
+        df = df[df['date'] <= end_dt]
+    return df.sort_values('date', kind='stable')
+
+def compile_calendar(csv_file=EVENTS_CSV):
+    """
+    Builds the compiled, date-sorted calendar from events.csv (see calendar_store).
+    Every row is kept, so changing IMPORTANT_EVENTS later needs no rebuild.
+    Returns the number of events written.
+    """
+    return calendar_store.write_compiled(read_calendar_csv(csv_file))
+
+def _load_csv_events(csv_file, start_date=None, end_date=None):
+    """
+    Events from the compiled calendar when it is up to date, else from the CSV itself.
+    """
+    if config.BAR_CACHE_MODE == 'use' and os.path.exists(calendar_store.compiled_path()):
+        if calendar_store.is_fresh(csv_file):
+            return calendar_store.read_compiled(*_date_bounds(start_date, end_date))
+        print("events.csv changed since the calendar was compiled; reading the CSV "
+              "(run 'python main.py compile-calendar' to rebuild).")
+    return read_calendar_csv(csv_file, start_date, end_date)
+
+@profiler.timed("calendar_load")
 def fetch_economic_calendar(start_date=None, end_date=None, api_key=None):
     """
     Fetches economic calendar data.
     If api_key is provided, tries FMP API first.
     Falls back to local CSV file (events.csv).
+    Both sources go through the same normalize/filter steps.
     """
     if api_key:
         try:
             df = fetch_from_fmp(api_key, start_date, end_date)
             if not df.empty:
                 print(f"Loaded {len(df)} events from FMP API")
-                
-                # Filter for important events/currencies
-                if 'impact' in df.columns:
-                    df['impact'] = df['impact'].str.lower()
-                
-                # Filter logic (same as CSV)
-                mask_impact = df['impact'] == 'high' if 'impact' in df.columns else pd.Series([True] * len(df))
-                mask_name = df['event'].apply(lambda x: any(important.lower() in str(x).lower() for important in config.IMPORTANT_EVENTS))
-                mask_currency = df['country'].isin(config.IMPORTANT_CURRENCIES)
-                
-                df = df[(mask_impact | mask_name) & mask_currency].copy()
-                return df
+                return filter_important(df)
                 
         except Exception as e:
             error_msg = str(e)
@@ -82,7 +186,7 @@ def fetch_economic_calendar(start_date=None, end_date=None, api_key=None):
             print("Falling back to events.csv...")
 
     # CSV Fallback Logic
-    csv_file = os.path.join(os.path.dirname(__file__), 'events.csv')
+    csv_file = EVENTS_CSV
     
     if not os.path.exists(csv_file):
         print(f"Error: {csv_file} not found!")
@@ -91,51 +195,13 @@ def fetch_economic_calendar(start_date=None, end_date=None, api_key=None):
         return pd.DataFrame()
     
     try:
-        # Read CSV file
-        df = pd.read_csv(csv_file)
+        df = _load_csv_events(csv_file, start_date, end_date)
         
         if df.empty:
             print("No events found in events.csv")
             return pd.DataFrame()
         
-        # Parse date and time
-        # Combine date and time columns
-        df['datetime_str'] = df['date'] + ' ' + df['time']
-        
-        # Parse to datetime
-        df['date'] = pd.to_datetime(df['datetime_str'], format='%Y-%m-%d %H:%M')
-        
-        # Convert to UTC (assuming times are in EST)
-        est = pytz.timezone('US/Eastern')
-        df['date'] = df['date'].apply(lambda x: est.localize(x).astimezone(pytz.utc))
-        
-        # Drop the temporary column
-        df = df.drop('datetime_str', axis=1)
-        
-        # Filter by date range if provided
-        if start_date:
-            start_dt = pd.to_datetime(start_date).tz_localize(pytz.utc)
-            df = df[df['date'] >= start_dt]
-        
-        if end_date:
-            end_dt = pd.to_datetime(end_date).tz_localize(pytz.utc)
-            df = df[df['date'] <= end_dt]
-        
-        # Normalize impact to lowercase
-        if 'impact' in df.columns:
-            df['impact'] = df['impact'].str.lower()
-        
-        # Filter for important events
-        mask_impact = df['impact'] == 'high' if 'impact' in df.columns else pd.Series([True] * len(df))
-        mask_name = df['event'].apply(lambda x: any(important.lower() in str(x).lower() for important in config.IMPORTANT_EVENTS))
-        mask_currency = df['country'].isin(config.IMPORTANT_CURRENCIES)
-        
-        df = df[(mask_impact | mask_name) & mask_currency].copy()
-        
-        # Add 'actual' column if not present (will be filled after release)
-        if 'actual' not in df.columns:
-            df['actual'] = 'Wait for release'
-        
+        df = filter_important(df)
         print(f"Loaded {len(df)} events from CSV file")
         
         return df
@@ -146,56 +212,383 @@ def fetch_economic_calendar(start_date=None, end_date=None, api_key=None):
         print("event,country,date,time,impact,estimate,previous")
         return pd.DataFrame()
 
-def fetch_market_data(ticker, event_time):
+def _event_window(event_time):
     """
-    Fetches 1-minute interval market data from yfinance around the event time.
+    Returns the (start, end) download window around an event.
     """
-    # Define window
     start_time = event_time - timedelta(minutes=config.PRE_EVENT_MINUTES)
     end_time = event_time + timedelta(minutes=config.POST_EVENT_MINUTES)
-    
+    return start_time, end_time
+
+# Shared by every thread that talks to Yahoo, so parallel runs stay polite
+_yahoo_slots = threading.BoundedSemaphore(config.YAHOO_MAX_CONCURRENT)
+_yahoo_rate = RateLimiter(config.YAHOO_TICKERS_PER_SECOND, burst=config.YAHOO_TICKERS_BURST)
+
+_stderr_lock = threading.Lock()
+_stderr_users = 0
+_stderr_saved = None
+
+@contextlib.contextmanager
+def _quiet_stderr():
+    """
+    Like contextlib.redirect_stderr, but safe when several threads download at once:
+    the first thread in swaps sys.stderr out, the last one out restores it.
+    """
+    global _stderr_users, _stderr_saved
+    with _stderr_lock:
+        if _stderr_users == 0:
+            _stderr_saved = sys.stderr
+            sys.stderr = io.StringIO()
+        _stderr_users += 1
     try:
-        # Download data from Yahoo Finance
+        yield
+    finally:
+        with _stderr_lock:
+            _stderr_users -= 1
+            if _stderr_users == 0:
+                sys.stderr = _stderr_saved
+
+def _download(tickers, start_time, end_time, interval):
+    """
+    Downloads bars from Yahoo Finance for one ticker (str) or many (list).
+    A list is fetched as a single grouped request with (Ticker, Price) columns.
+    Calls are limited to config.YAHOO_MAX_CONCURRENT at a time and rate limited per ticker.
+    Tickers whose download failed (rather than had no bars) are in df.attrs['failed_tickers'].
+    """
+    batched = isinstance(tickers, (list, tuple))
+    
+    with _yahoo_slots:
+        # yfinance makes one request per ticker under the hood
+        _yahoo_rate.acquire(len(tickers) if batched else 1)
+        
         # We set prepost=True to get data for 8:30 AM events (before market open)
         # We suppress stderr to hide the "1 Failed download" noise for older events
-        f = io.StringIO()
-        with contextlib.redirect_stderr(f):
-            df = yf.download(
-                ticker, 
-                start=start_time, 
-                end=end_time, 
-                interval="1m", 
-                progress=False,
-                prepost=True, 
-                auto_adjust=True, 
-                multi_level_index=False 
-            )
-        
-        if df.empty:
-            # Check if the event is older than 29 days (yfinance 1m limit)
-            days_diff = (datetime.now(pytz.utc) - start_time).days
-            if days_diff > 29:
-                print(f"  Event > 30 days old. Switching to 5m interval...")
-                df = yf.download(
-                    ticker, 
+        with profiler.stage("yf_download", interval=interval) as info, _quiet_stderr():
+            if batched:
+                info['tickers'] = len(tickers)
+            else:
+                info['ticker'] = tickers
+            
+            with _download_errors() as failed:
+                df = _yfinance().download(
+                    tickers, 
                     start=start_time, 
                     end=end_time, 
-                    interval="5m", 
+                    interval=interval, 
                     progress=False,
                     prepost=True, 
                     auto_adjust=True, 
-                    multi_level_index=False 
+                    group_by='ticker' if batched else 'column',
+                    multi_level_index=batched 
                 )
-                if not df.empty:
-                    print(f"  Fetched data (5m interval)...")
-            
-            if df.empty:
-                # Still empty? Market might be closed or ticker delisted
-                return pd.DataFrame()
-            
+            info['rows'] = 0 if df is None else len(df)
+            info['bytes'] = profiler.frame_bytes(df)
+            if df is None:
+                df = pd.DataFrame()
+            names = tickers if batched else [tickers]
+            df.attrs['failed_tickers'] = {t for t in names if t.upper() in failed}
+            return df
+
+# yfinance's reason for a ticker that simply has no bars in the window (as opposed to
+# a rate limit, timeout or HTTP error)
+_NO_DATA_ERROR = re.compile(r"no (price )?data found|possibly delisted|data doesn't exist|not available",
+                            re.IGNORECASE)
+# How yfinance.download() logs its failures: "['SPY', 'QQQ']: <reason>"
+_FAILED_LINE = re.compile(r"^\[(.*)\]: (.*)$", re.DOTALL)
+
+class _DownloadErrors(logging.Handler):
+    """
+    Collects the per-ticker failures yfinance.download() logs instead of raising.
+    It logs them from the calling thread once all tickers are done, so records from
+    other threads (other downloads running at the same time) are ignored.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.failed = set()
+
+    def emit(self, record):
+        if record.thread != self.thread:
+            return
+        match = _FAILED_LINE.match(record.getMessage().strip())
+        if match and not _NO_DATA_ERROR.search(match.group(2)):
+            self.failed.update(re.findall(r"'([^']+)'", match.group(1)))
+
+@contextlib.contextmanager
+def _download_errors():
+    """
+    Yields the set of tickers (upper case) whose download failed rather than came back
+    without bars; it is filled in when the block exits.
+    """
+    handler = _DownloadErrors()
+    logger = logging.getLogger('yfinance')
+    logger.addHandler(handler)
+    try:
+        yield handler.failed
+    finally:
+        logger.removeHandler(handler)
+
+def failed_frame():
+    """
+    Empty result for a ticker whose download failed, or whose window is unavailable at
+    any usable interval. df.attrs['failed'] tells it apart from a download that worked
+    and had no bars, so it is never cached as "no data".
+    """
+    df = pd.DataFrame()
+    df.attrs['failed'] = True
+    return df
+
+def _yfinance():
+    """
+    yfinance is imported on the first download: it takes a good part of a second to
+    load and calendar-only runs (--list, query, compile-calendar) never need it.
+    """
+    import yfinance
+    return yfinance
+
+def _split_batch(df, tickers):
+    """
+    Splits a grouped multi-ticker download back into one frame per ticker.
+    Tickers that are missing from the result (or came back all-NaN) get an empty frame,
+    tickers whose download failed a failed_frame().
+    """
+    failed = df.attrs.get('failed_tickers', set()) if df is not None else set()
+    frames = {}
+    for ticker in tickers:
+        if ticker in failed:
+            frames[ticker] = failed_frame()
+        elif df is None or df.empty or not isinstance(df.columns, pd.MultiIndex):
+            frames[ticker] = pd.DataFrame()
+        elif ticker in df.columns.get_level_values(0):
+            frames[ticker] = df[ticker].dropna(how='all')
+        elif ticker in df.columns.get_level_values(1):
+            frames[ticker] = df.xs(ticker, level=1, axis=1).dropna(how='all')
+        else:
+            frames[ticker] = pd.DataFrame()
+    return frames
+
+# Intervals the planner chooses from, finest first, with their pandas resample rules
+INTERVALS = {"1m": "1min", "5m": "5min", "15m": "15min", "1h": "1h"}
+
+def _interval_ladder():
+    """
+    Candidate intervals from config.BAR_INTERVAL up to the coarsest.
+    """
+    names = list(INTERVALS)
+    return names[names.index(config.BAR_INTERVAL):] if config.BAR_INTERVAL in names else names
+
+def _held_source(cache, ticker, interval, start_time, end_time):
+    """
+    The interval the cache can serve this window from: `interval` itself, else the
+    finest finer interval it fully holds (to derive from), else None.
+    """
+    names = list(INTERVALS)
+    finer = names[:names.index(interval)] if interval in names else []
+    for source in [interval] + finer:
+        if not cache.missing_ranges(ticker, source, start_time, end_time):
+            return source
+    return None
+
+def _post_event_bars(interval):
+    """
+    How many bars of this interval fit in the window after the release.
+    """
+    return int(config.POST_EVENT_MINUTES // (pd.Timedelta(INTERVALS[interval]).total_seconds() / 60))
+
+def plan_interval(tickers, start_time, end_time):
+    """
+    Chooses the bar interval for a window before anything is downloaded: the finest
+    interval that the local cache already holds for every ticker, or that Yahoo still
+    serves for a window this old (config.PROVIDER_RETENTION_DAYS).
+    Intervals too coarse to leave config.MIN_POST_EVENT_BARS bars after the release
+    are never used; returns None if no other interval is available any more.
+    """
+    cache = bar_cache.get_cache()
+    use_held = cache is not None and config.BAR_CACHE_MODE != 'refresh'
+    age_days = (datetime.now(pytz.utc) - start_time).total_seconds() / 86400
+    
+    for interval in _interval_ladder():
+        if _post_event_bars(interval) < config.MIN_POST_EVENT_BARS:
+            break
+        if age_days <= config.PROVIDER_RETENTION_DAYS.get(interval, float('inf')):
+            return interval
+        if use_held and all(_held_source(cache, t, interval, start_time, end_time) for t in tickers):
+            return interval
+    return None
+
+def resample_bars(df, interval):
+    """
+    Derives coarser OHLCV bars (e.g. 5m from 1m) aligned to clock boundaries.
+    """
+    if df.empty:
+        return df
+    how = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+    bars = df.resample(INTERVALS[interval], label='left', closed='left').agg(
+        {column: agg for column, agg in how.items() if column in df.columns}
+    )
+    return bars.dropna(subset=['Close'])
+
+def _fetch_interval(tickers, start_time, end_time, interval):
+    """
+    Returns {ticker: DataFrame} for one interval, going through the local bar cache.
+    Windows we already hold are served from disk; only the missing gaps are downloaded.
+    """
+    cache = bar_cache.get_cache()
+    use_held = cache is not None and config.BAR_CACHE_MODE != 'refresh'
+    
+    frames = {}
+    pending = list(tickers)
+    fetch_start, fetch_end = start_time, end_time
+    
+    if use_held:
+        sources = {t: _held_source(cache, t, interval, start_time, end_time) for t in tickers}
+        pending = [t for t in tickers if sources[t] is None]
+        
+        derived = 0
+        for ticker in tickers:
+            source = sources[ticker]
+            if source == interval:
+                frames[ticker] = cache.load(ticker, interval, start_time, end_time)
+            elif source is not None:
+                # Finer bars already on disk: build the coarser ones instead of downloading
+                frames[ticker] = resample_bars(cache.load(ticker, source, start_time, end_time), interval)
+                derived += 1
+        if frames:
+            note = f", {derived} derived from finer bars" if derived else ""
+            print(f"  Loaded {len(frames)} tickers ({interval}) from local cache{note}")
+        profiler.count("bar_cache", interval=interval, hits=len(frames), misses=len(pending))
+        
+        if pending:
+            # Download just the span covering the gaps instead of the full window
+            gaps = {t: cache.missing_ranges(t, interval, start_time, end_time) for t in pending}
+            fetch_start = min(gaps[t][0][0] for t in pending)
+            fetch_end = max(gaps[t][-1][1] for t in pending)
+    
+    if not pending:
+        return _tag_interval(frames, interval)
+    
+    if len(pending) == 1:
+        df = _download(pending[0], fetch_start, fetch_end, interval)
+        fetched = {pending[0]: failed_frame() if df.attrs['failed_tickers'] else df}
+    else:
+        fetched = _split_batch(_download(pending, fetch_start, fetch_end, interval), pending)
+    
+    for ticker, df in fetched.items():
+        if df.attrs.get('failed'):
+            frames[ticker] = df
+            continue
+        if cache is not None:
+            cache.store(ticker, interval, df, fetch_start, fetch_end)
+            if use_held:
+                # Merge the new bars with what we already held for this window
+                df = cache.load(ticker, interval, start_time, end_time)
+        frames[ticker] = df
+    
+    return _tag_interval(frames, interval)
+
+def _tag_interval(frames, interval):
+    """
+    Records the bar interval on each frame (df.attrs['interval']) so results can report it.
+    """
+    for df in frames.values():
+        df.attrs['interval'] = interval
+    return frames
+
+def _announce_plan(interval, start_time):
+    """
+    Says when a window is analyzed at a coarser interval than config.BAR_INTERVAL,
+    or can't be analyzed at all.
+    """
+    age_days = (datetime.now(pytz.utc) - start_time).days
+    if interval is None:
+        print(f"  Window is {age_days} days old: unavailable (no interval with at least "
+              f"{config.MIN_POST_EVENT_BARS} bars after the release is still served)")
+    elif interval != config.BAR_INTERVAL:
+        print(f"  Window is {age_days} days old: using {interval} bars "
+              f"({config.BAR_INTERVAL} history is kept {config.PROVIDER_RETENTION_DAYS.get(config.BAR_INTERVAL)} days)")
+
+def _fetch_single(ticker, start_time, end_time, interval=None):
+    """
+    Fetches one ticker for a window at the planned (or given) interval.
+    """
+    try:
+        if interval is None:
+            interval = plan_interval([ticker], start_time, end_time)
+            _announce_plan(interval, start_time)
+        if interval is None:
+            return failed_frame()
+        
+        # Download data from Yahoo Finance (or the local bar cache)
+        df = _fetch_interval([ticker], start_time, end_time, interval)[ticker]
+        
+        # An empty frame here means the market was closed or the ticker delisted
         return df
         
     except Exception as e:
         print(f"Error fetching market data for {ticker}: {e}")
-        return pd.DataFrame()
+        return failed_frame()
 
+def fetch_market_data(ticker, event_time):
+    """
+    Fetches market data from yfinance around the event time, at the finest interval
+    still available for it (see plan_interval).
+    """
+    start_time, end_time = _event_window(event_time)
+    return _fetch_single(ticker, start_time, end_time)
+
+def fetch_span_data(tickers, start_time, end_time):
+    """
+    Fetches market data for many tickers over [start_time, end_time) in one grouped request.
+    Returns a dictionary of DataFrames keyed by ticker (same shape as fetch_market_data).
+    Tickers that fail or come back empty are retried one by one. If no usable interval
+    is left for the window (see plan_interval), every ticker gets a failed_frame().
+    """
+    # Drop duplicates but keep the configured order
+    tickers = list(dict.fromkeys(tickers))
+    
+    # Pick the resolution up front, so old windows don't waste a 1m request first
+    interval = plan_interval(tickers, start_time, end_time)
+    _announce_plan(interval, start_time)
+    profiler.count("interval_plan", interval=interval)
+    if interval is None:
+        return {ticker: failed_frame() for ticker in tickers}
+    
+    frames = {}
+    try:
+        frames = _fetch_interval(tickers, start_time, end_time, interval)
+    except Exception as e:
+        print(f"Batch download failed: {e}")
+    
+    # Fall back to individual downloads for anything the batch could not fill
+    for ticker in tickers:
+        if frames.get(ticker) is None or frames[ticker].empty:
+            profiler.count("retry_single", ticker=ticker, retries=1)
+            frames[ticker] = _fetch_single(ticker, start_time, end_time, interval)
+    
+    return frames
+
+def fetch_market_data_batch(tickers, event_time):
+    """
+    Fetches market data for many tickers around the event time in one grouped request.
+    """
+    start_time, end_time = _event_window(event_time)
+    return fetch_span_data(tickers, start_time, end_time)
+
+def fetch_bars_since(tickers, since_time, until_time=None):
+    """
+    Fetches only the bars after since_time for many tickers in one grouped request.
+    Used by live mode, so it skips the bar cache (recent bars are still settling).
+    Returns {ticker: DataFrame}; tickers without new bars get an empty frame.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    until_time = until_time or datetime.now(pytz.utc)
+    
+    try:
+        if len(tickers) == 1:
+            df = _download(tickers[0], since_time, until_time, config.BAR_INTERVAL)
+            return {tickers[0]: df.dropna(how='all')}
+        return _split_batch(_download(tickers, since_time, until_time, config.BAR_INTERVAL), tickers)
+    except Exception as e:
+        print(f"Error polling market data: {e}")
+        return {ticker: pd.DataFrame() for ticker in tickers}
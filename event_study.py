@@ -0,0 +1,214 @@
+import warnings
+import numpy as np
+import pandas as pd
+import config
+from analyzer import iter_impacts
+from impact_series import as_impact_series
+
+class EventStudy:
+    """
+    All events and assets aligned on one grid of minutes relative to the release.
+
+    values has shape (event, asset, minute) and holds the % change from the
+    event-time baseline; bars that don't exist are NaN. Aggregations across
+    events are single NumPy reductions over axis 0.
+    """
+
+    def __init__(self, values, events, assets, minutes):
+        self.values = values
+        self.events = events.reset_index(drop=True)
+        self.assets = list(assets)
+        self.minutes = np.asarray(minutes)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __repr__(self):
+        return (f"EventStudy({len(self.events)} events x {len(self.assets)} assets x "
+                f"{len(self.minutes)} minutes [{self.minutes[0]}, {self.minutes[-1]}])")
+
+    @property
+    def mask(self):
+        """
+        Boolean array (event, asset, minute): True where a bar exists.
+        """
+        return ~np.isnan(self.values)
+
+    def _asset_index(self, assets):
+        if isinstance(assets, str):
+            assets = [assets]
+        return [self.assets.index(a) for a in assets]
+
+    def select(self, events=None, assets=None):
+        """
+        Returns a smaller EventStudy.
+        events: boolean mask / positions over self.events, or an event-name substring.
+        assets: asset name or list of asset names.
+        """
+        event_idx = np.arange(len(self.events))
+        if isinstance(events, str):
+            event_idx = np.flatnonzero(self.events['event'].str.contains(events, case=False, na=False).to_numpy())
+        elif events is not None:
+            event_idx = event_idx[np.asarray(events)]
+
+        asset_idx = np.arange(len(self.assets)) if assets is None else np.asarray(self._asset_index(assets))
+
+        return EventStudy(
+            self.values[np.ix_(event_idx, asset_idx, np.arange(len(self.minutes)))],
+            self.events.iloc[event_idx],
+            [self.assets[i] for i in asset_idx],
+            self.minutes
+        )
+
+    def last(self, n):
+        """
+        Returns the n most recent events.
+        """
+        order = np.argsort(self.events['date'].to_numpy(), kind='stable')[-n:]
+        return self.select(events=np.sort(order))
+
+    def rebase(self, minute=0):
+        """
+        Re-normalizes every path to 0% at the given relative minute (default: the release).
+        """
+        col = int(np.searchsorted(self.minutes, minute))
+        growth = 1 + self.values / 100
+        return EventStudy(
+            (growth / growth[:, :, col:col + 1] - 1) * 100, self.events, self.assets, self.minutes
+        )
+
+    def filled(self):
+        """
+        Returns a copy with gaps inside each path carried forward (e.g. 5m bars on the 1m grid).
+        """
+        values = self.values.copy()
+        valid = ~np.isnan(values)
+        last = np.where(valid, np.arange(values.shape[2]), 0)
+        np.maximum.accumulate(last, axis=2, out=last)
+        values = np.take_along_axis(values, last, axis=2)
+        return EventStudy(values, self.events, self.assets, self.minutes)
+
+    def _reduce(self, func, *args):
+        # Empty slices (a minute no event has a bar for) should quietly give NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return func(self.values, *args, axis=0)
+
+    def count(self):
+        """
+        Number of events with a bar, per (asset, minute).
+        """
+        return self.mask.sum(axis=0)
+
+    def mean(self):
+        """
+        Average path across events, shape (asset, minute).
+        """
+        return self._reduce(np.nanmean)
+
+    def median(self):
+        """
+        Median path across events, shape (asset, minute).
+        """
+        return self._reduce(np.nanmedian)
+
+    def std(self):
+        """
+        Standard deviation across events, shape (asset, minute).
+        """
+        return self._reduce(np.nanstd)
+
+    def percentile(self, q):
+        """
+        Percentile(s) across events; q may be a number or a sequence.
+        Shape (asset, minute) or (len(q), asset, minute).
+        """
+        return self._reduce(np.nanpercentile, q)
+
+    def bands(self, lower=25, upper=75):
+        """
+        Returns (lower, median, upper) paths across events.
+        """
+        low, mid, high = self.percentile([lower, 50, upper])
+        return low, mid, high
+
+    def to_frame(self, stat=None):
+        """
+        Long-format DataFrame (event_id, event, date, asset, minutes_relative, pct_change),
+        or, with stat='mean'/'median'/..., a minute x asset table of that statistic.
+        """
+        if stat is not None:
+            return pd.DataFrame(getattr(self, stat)().T, index=self.minutes, columns=self.assets)
+
+        n_events, n_assets, n_minutes = self.values.shape
+        event_id = np.repeat(np.arange(n_events), n_assets * n_minutes)
+        df = pd.DataFrame({
+            'event_id': event_id,
+            'event': self.events['event'].to_numpy()[event_id],
+            'date': self.events['date'].to_numpy()[event_id],
+            'asset': np.tile(np.repeat(self.assets, n_minutes), n_events),
+            'minutes_relative': np.tile(self.minutes, n_events * n_assets),
+            'pct_change': self.values.ravel()
+        })
+        return df.dropna(subset=['pct_change']).reset_index(drop=True)
+
+def minute_grid(pre=None, post=None):
+    """
+    Integer minutes from -pre to +post (inclusive), the shared time axis of an EventStudy.
+    """
+    pre = config.PRE_EVENT_MINUTES if pre is None else pre
+    post = config.POST_EVENT_MINUTES if post is None else post
+    return np.arange(-pre, post + 1)
+
+def _place(dest, matrix, minutes_relative, minutes):
+    """
+    Writes an (asset, time) matrix into dest (asset, minute) at the nearest grid minute.
+    """
+    cols = np.rint(np.asarray(minutes_relative, dtype=float)).astype(int) - minutes[0]
+    keep = (cols >= 0) & (cols < len(minutes))
+    dest[:, cols[keep]] = matrix[:, keep]
+
+def build_event_study(events, impacts, assets=None, minutes=None):
+    """
+    Stacks calculate_impact results into an EventStudy.
+    events: calendar DataFrame; impacts: {index: impact_data} (e.g. from calculate_impacts).
+    Events without any data are dropped. Bars are placed on the nearest whole minute.
+    """
+    if assets is None:
+        assets = list(config.ASSETS)
+    if minutes is None:
+        minutes = minute_grid()
+
+    labels = [label for label in events.index if impacts.get(label)]
+    values = np.full((len(labels), len(assets), len(minutes)), np.nan)
+
+    for e, label in enumerate(labels):
+        for a, asset_name in enumerate(assets):
+            series = as_impact_series(impacts[label].get(asset_name))
+            if series is None or series.empty:
+                continue
+            _place(values[e, a:a + 1], series.pct_change[None, :], series.minutes_relative, minutes)
+
+    return EventStudy(values, events.loc[labels], assets, minutes)
+
+def calculate_event_study(calendar_df, workers=1, minutes=None):
+    """
+    Fetches (or loads stored results for) every event in calendar_df and places each
+    result straight into the tensor as it arrives.
+    """
+    if minutes is None:
+        minutes = minute_grid()
+
+    assets = list(config.ASSETS)
+    row_of = {label: i for i, label in enumerate(calendar_df.index)}
+    values = np.full((len(calendar_df), len(assets), len(minutes)), np.nan)
+
+    for label, _, impact_data in iter_impacts(calendar_df, workers):
+        for a, asset_name in enumerate(assets):
+            series = as_impact_series(impact_data.get(asset_name))
+            if series is None or series.empty:
+                continue
+            _place(values[row_of[label], a:a + 1], series.pct_change[None, :], series.minutes_relative, minutes)
+
+    has_data = ~np.isnan(values).all(axis=(1, 2))
+    return EventStudy(values[has_data], calendar_df[has_data], assets, minutes)
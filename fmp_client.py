@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytz
+import config
+import profiler
+
+CALENDAR_URL = "https://financialmodelingprep.com/api/v3/economic_calendar"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    expires REAL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (start, end)
+);
+"""
+
+_session = None
+_session_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+def get_session():
+    """
+    One pooled session for every FMP call. Connections are reused across chunks and
+    threads, and 429/5xx answers are retried with exponential backoff
+    (honoring Retry-After).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is only loaded once the API is actually used (not for CSV calendars)
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=config.FMP_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                respect_retry_after_header=True,
+                # Hand back the last response so the caller can report its status
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.FMP_MAX_CONCURRENT, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def date_chunks(start_date, end_date, days=None):
+    """
+    Splits an inclusive 'YYYY-MM-DD' range into consecutive (start, end) pieces of at most `days` days.
+    """
+    days = days or config.FMP_CHUNK_DAYS
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        chunks.append((start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+def _path():
+    return os.path.join(config.CACHE_DIR, 'fmp.sqlite')
+
+@contextlib.contextmanager
+def _connect():
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_path(), timeout=30)
+    try:
+        conn.executescript(_SCHEMA)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+def _expires(end_date):
+    """
+    Chunks that ended before today can't change any more and never expire;
+    anything touching today or the future is re-fetched after the TTL.
+    """
+    today = datetime.now(pytz.utc).strftime('%Y-%m-%d')
+    if end_date < today:
+        return None
+    return time.time() + config.FMP_CACHE_TTL_MINUTES * 60
+
+def _cached(start, end):
+    if config.BAR_CACHE_MODE != 'use':
+        return None
+    with _cache_lock, _connect() as conn:
+        row = conn.execute("SELECT expires, body FROM responses WHERE start = ? AND end = ?", (start, end)).fetchone()
+    if row is None or (row[0] is not None and row[0] < time.time()):
+        return None
+    return json.loads(row[1])
+
+def _store(start, end, body):
+    if config.BAR_CACHE_MODE == 'off':
+        return
+    with _cache_lock, _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (start, end, time.time(), _expires(end), body)
+        )
+
+def _fetch_chunk(api_key, start, end):
+    """
+    One date chunk: from the response cache if possible, else from the API.
+    """
+    data = _cached(start, end)
+    if data is not None:
+        profiler.count("fmp_cache", hits=1)
+        return data
+
+    with profiler.stage("fmp_request") as info:
+        response = get_session().get(
+            CALENDAR_URL,
+            params={'from': start, 'to': end, 'apikey': api_key},
+            timeout=config.FMP_TIMEOUT_SECONDS
+        )
+        info['bytes'] = len(response.content)
+
+    if response.status_code != 200:
+        raise Exception(f"API Error: {response.status_code} - {response.text}")
+
+    _store(start, end, response.content)
+    return response.json()
+
+def fetch_calendar(api_key, start_date, end_date):
+    """
+    Economic calendar records for an inclusive date range.
+    Long ranges are split into FMP_CHUNK_DAYS chunks fetched in parallel;
+    records come back in chunk order.
+    """
+    chunks = date_chunks(start_date, end_date)
+    if len(chunks) == 1:
+        return _fetch_chunk(api_key, *chunks[0])
+
+    with ThreadPoolExecutor(max_workers=min(config.FMP_MAX_CONCURRENT, len(chunks))) as pool:
+        results = list(pool.map(lambda chunk: _fetch_chunk(api_key, *chunk), chunks))
+    return [record for records in results for record in records]
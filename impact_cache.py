@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import contextlib
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+import config
+import bar_cache
+from impact_series import ImpactSeries, as_impact_series
+
+# Events older than this keep their "no data" results too: Yahoo won't fill them in later
+EMPTY_RESULT_AFTER_DAYS = 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS impacts (
+    key TEXT PRIMARY KEY,
+    event_key TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    created REAL NOT NULL,
+    times BLOB,
+    minutes BLOB,
+    pct BLOB,
+    interval TEXT
+);
+CREATE INDEX IF NOT EXISTS impacts_event ON impacts (event_key);
+"""
+
+_lock = threading.Lock()
+
+def event_fingerprint(event_row):
+    """
+    Identifies an event by name, country and release time.
+    actual/estimate are left out on purpose: they get filled in after the release
+    but don't change the market data we analyze.
+    """
+    date = pd.Timestamp(event_row['date'])
+    date = date.tz_localize('UTC') if date.tzinfo is None else date.tz_convert('UTC')
+    parts = [str(event_row.get('event', '')), str(event_row.get('country', '')), date.isoformat()]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def result_key(event_key, ticker):
+    """
+    Cache key for one asset's impact: the event plus everything that shapes the result.
+    """
+    parts = [event_key, ticker, str(config.PRE_EVENT_MINUTES), str(config.POST_EVENT_MINUTES), config.BAR_INTERVAL]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def _path():
+    return os.path.join(config.CACHE_DIR, 'impacts.sqlite')
+
+@contextlib.contextmanager
+def _connect():
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_path(), timeout=30)
+    try:
+        conn.executescript(_SCHEMA)
+        # Caches created before results recorded their bar interval
+        if 'interval' not in [row[1] for row in conn.execute("PRAGMA table_info(impacts)")]:
+            conn.execute("ALTER TABLE impacts ADD COLUMN interval TEXT")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+def _decode(times, minutes, pct, interval):
+    if times is None:
+        return ImpactSeries(None, np.empty(0, dtype=np.int16), np.empty(0, dtype=np.float32), interval)
+    epochs = np.frombuffer(times, dtype=np.int64)
+    minutes = np.frombuffer(minutes, dtype=np.float64)
+    base = pd.Timestamp(int(epochs[0] - round(minutes[0] * 60)), unit='s', tz='UTC')
+    return ImpactSeries.from_arrays(base, minutes, np.frombuffer(pct, dtype=np.float64), interval)
+
+def load_impacts(calendar_df, tickers):
+    """
+    Looks up stored results for every event x ticker.
+    Returns {index: {ticker: ImpactSeries}}; tickers without a stored result are absent.
+    An empty series means "we know there is no data".
+    """
+    results = {label: {} for label in calendar_df.index}
+    if config.BAR_CACHE_MODE != 'use' or calendar_df.empty:
+        return results
+
+    wanted = {}
+    for label, row in calendar_df.iterrows():
+        event_key = event_fingerprint(row)
+        for ticker in tickers:
+            wanted[result_key(event_key, ticker)] = (label, ticker)
+
+    keys = list(wanted)
+    with _connect() as conn:
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, times, minutes, pct, interval FROM impacts WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, times, minutes, pct, interval in rows:
+                label, ticker = wanted[key]
+                results[label][ticker] = _decode(times, minutes, pct, interval)
+
+    return results
+
+def store_impacts(event_row, impact_by_ticker, tickers):
+    """
+    Saves one event's freshly computed results for the given tickers.
+    Nothing is saved until the event's whole window has settled (its last bar is
+    bar_cache.SETTLE_MINUTES old), so a run during the window doesn't keep a cut-off
+    path forever. Tickers with no data are only remembered once the event is old enough;
+    leave out tickers whose download failed, they are not "no data".
+    """
+    if config.BAR_CACHE_MODE == 'off':
+        return
+
+    event_key = event_fingerprint(event_row)
+    event_time = pd.Timestamp(event_row['date'])
+    event_time = event_time.tz_localize('UTC') if event_time.tzinfo is None else event_time
+    window_end = event_time + timedelta(minutes=config.POST_EVENT_MINUTES + bar_cache.SETTLE_MINUTES)
+    if window_end >= datetime.now(pytz.utc):
+        return
+    settled = event_time < datetime.now(pytz.utc) - timedelta(days=EMPTY_RESULT_AFTER_DAYS)
+
+    rows = []
+    now = datetime.now(pytz.utc).timestamp()
+    for ticker in tickers:
+        series = as_impact_series(impact_by_ticker.get(ticker))
+        if series is None or series.empty:
+            if settled:
+                rows.append((result_key(event_key, ticker), event_key, ticker, now, None, None, None, None))
+            continue
+
+        # Stored as epoch seconds and float64, the same layout older caches used
+        base = (series.base - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        epochs = base + series.offsets.astype(np.int64) * 60
+        rows.append((
+            result_key(event_key, ticker), event_key, ticker, now,
+            epochs.tobytes(),
+            series.offsets.astype(np.float64).tobytes(),
+            series.values.astype(np.float64).tobytes(),
+            series.interval
+        ))
+
+    if rows:
+        with _lock, _connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO impacts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
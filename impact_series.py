@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+class ImpactSeries:
+    """
+    One asset's reaction to one event, kept as plain arrays:
+    the release time once, whole-minute offsets from it (int16, or int32 for
+    windows longer than ~22 days) and the % change from the baseline (float32).
+
+    Slicing returns views that share the arrays. to_frame() builds the
+    DataFrame form (time, minutes_relative, pct_change) for callers that need pandas.
+    """
+
+    __slots__ = ('base', 'offsets', 'values', 'interval')
+
+    def __init__(self, base, offsets, values, interval=None):
+        self.base = base
+        self.offsets = offsets
+        self.values = values
+        self.interval = interval
+
+    @classmethod
+    def from_arrays(cls, base, minutes_relative, pct_change, interval=None):
+        """
+        Builds a series from minutes relative to `base` (rounded to whole minutes) and % changes.
+        """
+        base = pd.Timestamp(base)
+        base = base.tz_localize('UTC') if base.tzinfo is None else base.tz_convert('UTC')
+        minutes = np.rint(np.asarray(minutes_relative, dtype=float))
+        small = minutes.size == 0 or np.abs(minutes).max() <= np.iinfo(np.int16).max
+        return cls(
+            base,
+            minutes.astype(np.int16 if small else np.int32),
+            np.asarray(pct_change, dtype=np.float32),
+            interval
+        )
+
+    @classmethod
+    def from_frame(cls, df, base=None):
+        """
+        Converts a calculate_impact-style DataFrame. Without `base`, the release time is
+        recovered from the 'time' and 'minutes_relative' columns.
+        """
+        if base is None and len(df) and 'time' in df:
+            first = pd.Timestamp(df['time'].iloc[0])
+            base = first - pd.Timedelta(minutes=float(df['minutes_relative'].iloc[0]))
+        return cls.from_arrays(base, df['minutes_relative'], df['pct_change'], df.attrs.get('interval'))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __repr__(self):
+        return f"ImpactSeries({len(self)} bars from {self.base}, interval={self.interval})"
+
+    def __getitem__(self, key):
+        return ImpactSeries(self.base, self.offsets[key], self.values[key], self.interval)
+
+    @property
+    def empty(self):
+        return len(self.offsets) == 0
+
+    @property
+    def minutes_relative(self):
+        return self.offsets
+
+    @property
+    def pct_change(self):
+        return self.values
+
+    @property
+    def time(self):
+        """
+        Bar timestamps (UTC), built on demand.
+        """
+        return self.base + pd.to_timedelta(self.offsets.astype(np.int64), unit='min')
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.values.nbytes
+
+    def window(self, start_minute=None, end_minute=None):
+        """
+        Zero-copy view of the bars with start_minute <= offset <= end_minute.
+        """
+        lo = 0 if start_minute is None else np.searchsorted(self.offsets, start_minute, side='left')
+        hi = len(self) if end_minute is None else np.searchsorted(self.offsets, end_minute, side='right')
+        return self[lo:hi]
+
+    def max_abs(self):
+        """
+        Largest absolute move, NaN when there are no bars.
+        """
+        return float(np.abs(self.values).max()) if len(self) else np.nan
+
+    def to_frame(self):
+        """
+        DataFrame with time, minutes_relative and pct_change columns, indexed by time.
+        """
+        time = self.time
+        df = pd.DataFrame({
+            'time': time,
+            'minutes_relative': self.offsets.astype(float),
+            'pct_change': self.values.astype(float)
+        }, index=time)
+        df.attrs['interval'] = self.interval
+        return df
+
+def as_impact_series(data):
+    """
+    Accepts an ImpactSeries or a calculate_impact-style DataFrame and returns an ImpactSeries.
+    """
+    if data is None or isinstance(data, ImpactSeries):
+        return data
+    return ImpactSeries.from_frame(data)
@@ -0,0 +1,169 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import config
+
+class LeadLag:
+    """
+    Cross-correlations of post-release 1-minute returns for every asset pair of every event.
+
+    xcorr has shape (event, asset, asset, lag): xcorr[e, i, j, k] is the correlation of
+    asset i's return at minute t with asset j's return at minute t + lags[k], so a peak
+    at a positive lag means asset i moved first. valid (event, asset) marks the paths
+    with enough moving bars to take part.
+    """
+
+    def __init__(self, xcorr, valid, events, assets, lags):
+        self.xcorr = xcorr
+        self.valid = valid
+        self.events = events.reset_index(drop=True)
+        self.assets = list(assets)
+        self.lags = np.asarray(lags)
+
+    def __len__(self):
+        return self.xcorr.shape[0]
+
+    def __repr__(self):
+        return (f"LeadLag({len(self)} events x {len(self.assets)} assets, "
+                f"lags {self.lags[0]}..{self.lags[-1]} min)")
+
+    def event_types(self):
+        return list(dict.fromkeys(self.events['event']))
+
+    def matrices(self, event_type=None):
+        """
+        Asset x asset tables over the events of one type (default: all events):
+          lead_minutes  lag of the strongest average cross-correlation (> 0: row leads column)
+          peak_corr     the average cross-correlation at that lag
+          corr          average same-minute correlation
+          corr_std      its standard deviation across events (how stable it is)
+          events        events in which both assets had data
+        Events only count for pairs where both assets had data.
+        """
+        rows = np.ones(len(self), dtype=bool) if event_type is None else (self.events['event'] == event_type).to_numpy()
+        xcorr, valid = self.xcorr[rows], self.valid[rows]
+
+        pair = (valid[:, :, None] & valid[:, None, :]).astype(float)
+        n = pair.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.einsum('eij,eijk->ijk', pair, xcorr) / n[:, :, None]
+            zero = int(np.flatnonzero(self.lags == 0)[0])
+            corr = mean[:, :, zero]
+            spread = np.einsum('eij,eij->ij', pair, (xcorr[:, :, :, zero] - corr) ** 2) / n
+
+        peak = np.argmax(np.abs(np.nan_to_num(mean)), axis=2)
+        peak_corr = np.take_along_axis(mean, peak[:, :, None], axis=2)[:, :, 0]
+        lead = np.where(n > 0, self.lags[peak], np.nan)
+
+        frame = lambda values: pd.DataFrame(values, index=self.assets, columns=self.assets)
+        return {
+            'lead_minutes': frame(lead),
+            'peak_corr': frame(peak_corr),
+            'corr': frame(corr),
+            'corr_std': frame(np.sqrt(spread)),
+            'events': frame(n.astype(int))
+        }
+
+    def to_frame(self):
+        """
+        One row per event type and asset pair (each pair once): event, asset_a, asset_b,
+        events, lead_minutes (> 0: asset_a leads), peak_corr, corr, corr_std.
+        """
+        upper = np.triu_indices(len(self.assets), k=1)
+        frames = []
+        for event_type in self.event_types():
+            tables = self.matrices(event_type)
+            frames.append(pd.DataFrame({
+                'event': event_type,
+                'asset_a': np.asarray(self.assets)[upper[0]],
+                'asset_b': np.asarray(self.assets)[upper[1]],
+                **{name: tables[name].to_numpy()[upper] for name in
+                   ('events', 'lead_minutes', 'peak_corr', 'corr', 'corr_std')}
+            }))
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        return df[df['events'] > 0].reset_index(drop=True)
+
+def _standardized_returns(study):
+    """
+    Post-release 1-minute log returns (event, asset, minute) scaled to zero mean and unit
+    variance per path, plus the (event, asset) mask of paths that moved on at least
+    config.LEAD_LAG_MIN_RETURNS bars. Gaps are carried forward, so they count as flat minutes.
+    """
+    post = study.minutes >= 0
+    level = np.log1p(study.filled().values[:, :, post] / 100)
+    returns = np.nan_to_num(np.diff(level, axis=2))
+
+    valid = (returns != 0).sum(axis=2) >= config.LEAD_LAG_MIN_RETURNS
+    std = returns.std(axis=2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(valid[:, :, None] & (std > 0), (returns - returns.mean(axis=2, keepdims=True)) / std, 0.0)
+    return z, valid & (std[:, :, 0] > 0)
+
+def compute_lead_lag(study, max_lag=None):
+    """
+    Lead-lag cross-correlations for every asset pair and every event of an EventStudy,
+    in one FFT pass per block of config.LEAD_LAG_EVENT_BLOCK events (no per-pair loops).
+    Lags run from -max_lag to +max_lag minutes. Needs 1-minute bars to say anything
+    about who moves first; coarser bars mostly end up below LEAD_LAG_MIN_RETURNS.
+    """
+    max_lag = config.LEAD_LAG_MAX_MINUTES if max_lag is None else max_lag
+    z, valid = _standardized_returns(study)
+    n_events, n_assets, n_minutes = z.shape
+    max_lag = min(max_lag, max(n_minutes - 1, 0))
+    lags = np.arange(-max_lag, max_lag + 1)
+
+    # Zero-padding to at least n + max_lag keeps the circular correlation from wrapping
+    nfft = 1 << int(n_minutes + max_lag - 1).bit_length()
+    positions = lags % nfft
+
+    xcorr = np.zeros((n_events, n_assets, n_assets, len(lags)), dtype=np.float32)
+    for lo in range(0, n_events, config.LEAD_LAG_EVENT_BLOCK):
+        spectrum = np.fft.rfft(z[lo:lo + config.LEAD_LAG_EVENT_BLOCK], n=nfft, axis=2)
+        # sum_t z_i[t] z_j[t + k] for all i, j at once: conj(F_i) * F_j
+        cross = np.conj(spectrum)[:, :, None, :] * spectrum[:, None, :, :]
+        xcorr[lo:lo + config.LEAD_LAG_EVENT_BLOCK] = np.fft.irfft(cross, n=nfft, axis=3)[..., positions] / max(n_minutes, 1)
+
+    return LeadLag(xcorr, valid, study.events, study.assets, lags)
+
+def _slug(event_type):
+    return re.sub(r'[^a-z0-9]+', '-', str(event_type).lower()).strip('-') or 'event'
+
+def write_lead_lag(lead_lag, out_dir):
+    """
+    Writes one CSV per event type (<out_dir>/<event>.csv) holding its matrices stacked
+    as (matrix, asset) rows, plus the pairwise summary in <out_dir>/lead_lag.csv.
+    Returns the number of event types written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for event_type in lead_lag.event_types():
+        tables = lead_lag.matrices(event_type)
+        stacked = pd.concat(tables, names=['matrix', 'asset'])
+        stacked.to_csv(os.path.join(out_dir, f"{_slug(event_type)}.csv"))
+    lead_lag.to_frame().to_csv(os.path.join(out_dir, 'lead_lag.csv'), index=False)
+    return len(lead_lag.event_types())
+
+def print_lead_lag(lead_lag, top=10):
+    """
+    Prints, per event type, the asset pairs with the strongest lead-lag relation.
+    """
+    summary = lead_lag.to_frame()
+    if summary.empty:
+        print("No asset pairs with enough 1-minute bars to compare.")
+        return
+
+    leading = summary[summary['lead_minutes'] != 0].copy()
+    leading['strength'] = leading['peak_corr'].abs()
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        for event_type, rows in leading.groupby('event', sort=False):
+            rows = rows.sort_values('strength', ascending=False).head(top)
+            # Name the leader first
+            flip = rows['lead_minutes'] < 0
+            rows.loc[flip, ['asset_a', 'asset_b']] = rows.loc[flip, ['asset_b', 'asset_a']].to_numpy()
+            rows['lead_minutes'] = rows['lead_minutes'].abs()
+            print(f"\n--- {event_type}: strongest lead-lag pairs ---")
+            print(rows.rename(columns={'asset_a': 'leader', 'asset_b': 'follower'})[
+                ['leader', 'follower', 'lead_minutes', 'peak_corr', 'corr', 'corr_std', 'events']
+            ].to_string(index=False))
@@ -0,0 +1,347 @@
+import json
+import time
+import threading
+import webbrowser
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytz
+from plotly.offline import get_plotlyjs
+import config
+from data_loader import fetch_bars_since, INTERVALS
+from analyzer import iter_asset_impacts
+from visualizer import plot_event_impact, downsample
+from impact_series import ImpactSeries
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title} (live)</title>
+<script src="/plotly.min.js"></script>
+<style>body {{ background: #111; color: #ddd; font-family: sans-serif; margin: 0; }}
+#status {{ padding: 6px 12px; font-size: 13px; }}</style>
+</head>
+<body>
+<div id="status">Waiting for data...</div>
+{chart}
+<script>
+const traceIndex = {trace_index};
+let cursor = 0;
+async function poll() {{
+    try {{
+        const response = await fetch('/updates?since=' + cursor);
+        const update = await response.json();
+        cursor = update.cursor;
+        const names = Object.keys(update.series).filter(name => name in traceIndex);
+        if (names.length) {{
+            // Append only the new bars; the figure itself is never rebuilt
+            Plotly.extendTraces('live-chart', {{
+                x: names.map(name => update.series[name].x),
+                y: names.map(name => update.series[name].y)
+            }}, names.map(name => traceIndex[name]));
+        }}
+        document.getElementById('status').textContent = update.status;
+    }} catch (e) {{}}
+    setTimeout(poll, {poll_ms});
+}}
+poll();
+</script>
+</body>
+</html>
+"""
+
+class _ChartSession:
+    """
+    The state a chart page polls: an update log of {asset_name: {'x', 'y'}} points
+    appended under a lock, and a status line.
+    """
+
+    def __init__(self, event_row, status):
+        self.event_row = event_row
+        self.event_time = pd.Timestamp(event_row['date']).tz_convert('UTC')
+        self.updates = []
+        self.status = status
+        self._lock = threading.Lock()
+
+    def updates_since(self, cursor):
+        """
+        Merges every update after the given cursor. Returns (new_cursor, series, status).
+        """
+        with self._lock:
+            return _merge_updates(self.updates, cursor) + (self.status,)
+
+class LiveSession(_ChartSession):
+    """
+    Per-asset impact series for one event that grow as new bars arrive.
+
+    Each poll only asks Yahoo for bars after the newest one already held and
+    appends them, so the cost of a poll depends on how many bars are new,
+    not on how long the window is so far. Appended points are also kept as an
+    update log that the chart page reads incrementally. Only bars whose minute has
+    closed are taken: Yahoo's in-progress bar still has a partial close, and an
+    appended point is never revised.
+    """
+
+    def __init__(self, event_row):
+        super().__init__(event_row, "Waiting for release")
+        self.start_time = self.event_time - timedelta(minutes=config.PRE_EVENT_MINUTES)
+        self.end_time = self.event_time + timedelta(minutes=config.POST_EVENT_MINUTES)
+
+        self.tickers = dict(config.ASSETS)
+        self.series = {asset_name: {'minutes_relative': [], 'pct_change': []} for asset_name in self.tickers}
+        self.last_bar = {asset_name: None for asset_name in self.tickers}
+        self.baseline = {asset_name: None for asset_name in self.tickers}
+        self._pending = {asset_name: [] for asset_name in self.tickers}
+
+    def impact_data(self):
+        """
+        Current series in calculate_impact form ({asset_name: ImpactSeries}).
+        """
+        with self._lock:
+            return {
+                asset_name: ImpactSeries.from_arrays(self.event_time, values['minutes_relative'], values['pct_change'])
+                for asset_name, values in self.series.items()
+            }
+
+    def _poll_groups(self):
+        """
+        Groups tickers by the time we need bars after: just past each one's newest bar,
+        or the window start for tickers we have nothing for yet.
+        """
+        groups = {}
+        for asset_name, ticker in self.tickers.items():
+            last = self.last_bar[asset_name]
+            since = last + timedelta(seconds=1) if last is not None else self.start_time
+            groups.setdefault(since, [])
+            if ticker not in groups[since]:
+                groups[since].append(ticker)
+        return groups
+
+    def _set_baseline(self, asset_name):
+        """
+        Fixes the baseline once a bar at or after the release exists:
+        the last bar at or before release time, else the first one after it.
+        """
+        bars = self._pending[asset_name]
+        if not bars or bars[-1][0] < self.event_time:
+            return False
+        at_or_before = [close for ts, close in bars if ts <= self.event_time]
+        self.baseline[asset_name] = at_or_before[-1] if at_or_before else bars[0][1]
+        return True
+
+    def poll(self):
+        """
+        Fetches bars newer than the last one held and appends the ones that have closed.
+        Returns the number of new points.
+        """
+        # The bar still in progress is left for a later poll
+        closed_before = pd.Timestamp(datetime.now(pytz.utc)) - pd.Timedelta(INTERVALS[config.BAR_INTERVAL])
+        new_bars = {}
+        for since, tickers in self._poll_groups().items():
+            new_bars.update(fetch_bars_since(tickers, since, self.end_time))
+
+        added = {}
+        for asset_name, ticker in self.tickers.items():
+            df = new_bars.get(ticker)
+            if df is None or df.empty or 'Close' not in df:
+                continue
+
+            close = df['Close'].dropna()
+            index = close.index.tz_convert('UTC') if close.index.tz is not None else close.index.tz_localize('UTC')
+            last = self.last_bar[asset_name]
+            keep = (index <= closed_before) & ((index > last) if last is not None else True)
+            index, values = index[keep], close.to_numpy()[keep]
+            if len(index) == 0:
+                continue
+
+            self.last_bar[asset_name] = index[-1]
+            self._pending[asset_name].extend(zip(index, values))
+
+            if self.baseline[asset_name] is None and not self._set_baseline(asset_name):
+                continue
+
+            # Normalize everything we were holding back and start appending
+            baseline = self.baseline[asset_name]
+            bars, self._pending[asset_name] = self._pending[asset_name], []
+            added[asset_name] = {
+                'x': [(ts - self.event_time).total_seconds() / 60 for ts, _ in bars],
+                'y': [(close_price - baseline) / baseline * 100 for _, close_price in bars]
+            }
+
+        count = sum(len(points['x']) for points in added.values())
+        now = datetime.now(pytz.utc)
+        with self._lock:
+            for asset_name, points in added.items():
+                self.series[asset_name]['minutes_relative'].extend(points['x'])
+                self.series[asset_name]['pct_change'].extend(points['y'])
+            if added:
+                self.updates.append(added)
+            minutes_in = (now - self.event_time).total_seconds() / 60
+            self.status = f"{now:%H:%M:%S} UTC | +{minutes_in:.1f} min after release | {count} new bars"
+        return count
+
+class ProgressiveSession(_ChartSession):
+    """
+    One past event's chart, filled in asset by asset as analyzer.iter_asset_impacts
+    yields them. The page starts with an empty line per asset and each finished
+    asset is sent through the same update log as LiveSession, so the core assets
+    are on screen while the rest are still downloading.
+    """
+
+    def __init__(self, event_row):
+        super().__init__(event_row, f"Fetching 0/{len(config.ASSETS)} assets...")
+        self.results = {}
+
+    def impact_data(self):
+        """
+        Every configured asset, empty until its result has arrived ({asset_name: ImpactSeries}).
+        """
+        with self._lock:
+            empty = ImpactSeries.from_arrays(self.event_time, [], [])
+            return {asset_name: self.results.get(asset_name, empty) for asset_name in config.ASSETS}
+
+    def add(self, asset_name, series):
+        """
+        Records one asset's finished series and queues it for the page.
+        """
+        x, y = downsample(series.minutes_relative, series.pct_change, config.CHART_POINTS_PER_TRACE)
+        with self._lock:
+            self.results[asset_name] = series
+            self.updates.append({asset_name: {'x': x.tolist(), 'y': y.tolist()}})
+            self.status = f"Fetching {len(self.results)}/{len(config.ASSETS)} assets..."
+
+    def finish(self):
+        with self._lock:
+            self.status = f"{len(self.results)}/{len(config.ASSETS)} assets with data"
+
+def _merge_updates(updates, cursor):
+    """
+    Concatenates the points of updates[cursor:] per asset. Returns (new_cursor, series).
+    """
+    merged = {}
+    for update in updates[cursor:]:
+        for asset_name, points in update.items():
+            target = merged.setdefault(asset_name, {'x': [], 'y': []})
+            target['x'].extend(points['x'])
+            target['y'].extend(points['y'])
+    return len(updates), merged
+
+def _make_handler(page, session):
+    plotly_js = get_plotlyjs().encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/":
+                self._send(page.encode('utf-8'), "text/html; charset=utf-8")
+            elif url.path == "/plotly.min.js":
+                self._send(plotly_js, "application/javascript")
+            elif url.path == "/updates":
+                cursor = int(parse_qs(url.query).get('since', ['0'])[0])
+                cursor, series, status = session.updates_since(cursor)
+                body = json.dumps({'cursor': cursor, 'series': series, 'status': status})
+                self._send(body.encode('utf-8'), "application/json")
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            # Keep the terminal for our own progress messages
+            pass
+
+    return Handler
+
+def serve_chart(session, port=0, poll_seconds=None):
+    """
+    Starts a local page that shows the event chart and appends new points as they arrive.
+    Returns (server, url).
+    """
+    fig, config_options = plot_event_impact(session.event_row, session.impact_data())
+    trace_index = {trace.name: i for i, trace in enumerate(fig.data)}
+    chart = fig.to_html(full_html=False, include_plotlyjs=False, div_id='live-chart', config=config_options)
+
+    page = _PAGE.format(
+        title=session.event_row['event'],
+        chart=chart,
+        trace_index=json.dumps(trace_index),
+        poll_ms=int((poll_seconds or config.LIVE_POLL_SECONDS) * 1000)
+    )
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(page, session))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def wait_for_release(event_time):
+    """
+    Sleeps until the release time, printing a countdown.
+    """
+    while True:
+        remaining = (event_time - datetime.now(pytz.utc)).total_seconds()
+        if remaining <= 0:
+            return
+        print(f"\r  Release in {int(remaining // 60):02d}:{int(remaining % 60):02d}  ", end="", flush=True)
+        time.sleep(min(remaining, 1))
+
+def run_live(event_row, port=0, open_browser=True):
+    """
+    Watches one release as it happens: waits for the release time, then polls for
+    new bars until the end of the analysis window.
+    """
+    session = LiveSession(event_row)
+    server, url = serve_chart(session, port)
+    print(f"Live chart: {url}")
+    if open_browser:
+        webbrowser.open(url)
+
+    try:
+        wait_for_release(session.event_time)
+        print("\nReleased! Polling for new bars...")
+
+        while datetime.now(pytz.utc) < session.end_time + timedelta(minutes=config.LIVE_GRACE_MINUTES):
+            session.poll()
+            print(f"  {session.status}")
+            time.sleep(config.LIVE_POLL_SECONDS)
+
+        # One last poll for bars published after the window closed
+        session.poll()
+        print("Analysis window complete.")
+        input("Press Enter to close the live chart...")
+    finally:
+        server.shutdown()
+
+    return session
+
+def run_progressive(event_row, port=0, open_browser=True, workers=None):
+    """
+    Charts one past event while its data is still downloading: the page opens
+    straight away and each asset's line appears as soon as it has been fetched
+    and normalized, core assets first (see analyzer.iter_asset_impacts).
+    """
+    session = ProgressiveSession(event_row)
+    server, url = serve_chart(session, port, poll_seconds=config.STREAM_POLL_SECONDS)
+    print(f"Progressive chart: {url}")
+    if open_browser:
+        webbrowser.open(url)
+
+    try:
+        started = time.perf_counter()
+        for asset_name, series in iter_asset_impacts(event_row, workers=workers):
+            if not session.results:
+                print(f"  First asset ready after {time.perf_counter() - started:.1f}s ({asset_name})")
+            session.add(asset_name, series)
+        session.finish()
+        print(f"  {session.status} after {time.perf_counter() - started:.1f}s")
+    except BaseException:
+        server.shutdown()
+        raise
+
+    return session, server
@@ -4,36 +4,149 @@ from datetime import datetime, timedelta
 import pandas as pd
 import pytz
 import config
-from data_loader import fetch_economic_calendar
-from analyzer import calculate_impact
-from visualizer import plot_event_impact
+import profiler
+import calendar_store
+from data_loader import fetch_economic_calendar, compile_calendar
+from analyzer import iter_impacts, plan_fetches
+from event_study import calculate_event_study
+from lead_lag import compute_lead_lag, write_lead_lag, print_lead_lag
+from surprise import print_surprise, write_surprise
+from metrics import compute_reaction_metrics, store_metrics, query_metrics, METRIC_COLUMNS
+from universe import load_universe
+from cross_section import iter_cross_sections, print_cross_section
 
-def main():
+# Top-level options that only apply to the default chart run
+CHART_ONLY_OPTIONS = ("--batch", "--out", "--format", "--live", "--stream", "--port", "--list", "--dry-run", "--render-workers")
+# Subcommands that pick events from the calendar and so take the calendar options too
+CALENDAR_COMMANDS = ("index", "universe", "lead-lag", "surprise")
+
+def add_calendar_arguments(parser, subcommand=False):
+    """
+    Options for picking events from the calendar, shared by the default run and subcommands.
+    The subcommand copies have no defaults of their own (the top-level parser supplies them),
+    so `main.py --workers 8 index` keeps the 8 instead of resetting it.
+    """
+    default = (lambda value: argparse.SUPPRESS) if subcommand else (lambda value: value)
+    parser.add_argument("--event", type=str, help="Filter by specific event name (e.g., 'CPI')", default=default(None))
+    parser.add_argument("--date", type=str, help="Date of the event (YYYY-MM-DD). If not specified, shows all events.", default=default(None))
+    parser.add_argument("--days", type=int, help="Include every event within N days of --date (or of today if no date). Without it, --date means that day only", default=default(0))
+    parser.add_argument("--workers", type=int, help="Fetch and analyze events on N parallel workers", default=default(1))
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local minute-bar cache (always download)", default=default(False))
+    parser.add_argument("--refresh-cache", action="store_true", help="Re-download market data and overwrite the local cache", default=default(False))
+    parser.add_argument("--profile", action="store_true", help="Print per-stage timing, rows fetched, cache hits and retries at the end", default=default(False))
+    parser.add_argument("--profile-out", type=str, help="Also append the raw timing records to this JSON lines file", default=default(None))
+
+def check_top_level_options(parser, args, argv):
+    """
+    Rejects options given before a subcommand that the subcommand would ignore
+    (e.g. `--batch index`), instead of silently dropping them.
+    """
+    if args.command is None:
+        return
+    for token in argv[:argv.index(args.command)]:
+        option = token.split('=', 1)[0]
+        if not option.startswith('--'):
+            continue
+        if option in CHART_ONLY_OPTIONS or args.command not in CALENDAR_COMMANDS:
+            parser.error(f"{option} does not apply to '{args.command}'")
+
+def parse_thresholds(items):
+    """
+    Turns ["move_5=0.1", ...] into {"move_5": 0.1, ...}.
+    """
+    thresholds = {}
+    for item in items or []:
+        metric, _, value = item.partition('=')
+        thresholds[metric.strip()] = float(value)
+    return thresholds
+
+def build_parser():
     parser = argparse.ArgumentParser(description="Real-time Macro Event Impact Tracker")
-    parser.add_argument("--event", type=str, help="Filter by specific event name (e.g., 'CPI')")
-    parser.add_argument("--date", type=str, help="Date of the event (YYYY-MM-DD). If not specified, shows all events.", default=None)
-    parser.add_argument("--days", type=int, help="Number of days to look back/forward if no specific date", default=0)
-    
-    args = parser.parse_args()
-    
-    # Determine date range (only if date is specified)
-    if args.date:
-        target_date = datetime.strptime(args.date, '%Y-%m-%d')
+    add_calendar_arguments(parser)
+    parser.add_argument("--batch", action="store_true", help="Non-interactive: write reports to --out instead of opening charts")
+    parser.add_argument("--out", type=str, help="Output directory for --batch reports", default="reports")
+    parser.add_argument("--format", type=str, help="Report formats for --batch, comma separated (html,png)", default="html")
+    parser.add_argument("--live", action="store_true", help="Wait for the next matching release and chart it live as bars arrive")
+    parser.add_argument("--stream", action="store_true", help="Open each chart right away and draw assets as they arrive, core assets first")
+    parser.add_argument("--port", type=int, help="Local port for the --live/--stream chart (default: any free port)", default=0)
+    parser.add_argument("--list", "--dry-run", dest="list", action="store_true", help="Only show the matching events and the downloads they would need (no market data, no charts)")
+    parser.add_argument("--render-workers", type=int, help="Processes used to render --batch reports (default: CPU count)", default=None)
+
+    commands = parser.add_subparsers(dest="command")
+
+    index_parser = commands.add_parser("index", help="Compute reaction metrics for matched events and store them locally")
+    add_calendar_arguments(index_parser, subcommand=True)
+
+    universe_parser = commands.add_parser("universe", help="Cross-sectional reaction stats (group mean, dispersion, top/bottom movers) over a large asset universe")
+    add_calendar_arguments(universe_parser, subcommand=True)
+    universe_parser.add_argument("--universe", type=str, help="CSV with ticker[,name][,group] columns (default: config.ASSETS)", default=None)
+    universe_parser.add_argument("--top", type=int, help="Top/bottom movers to show per event", default=config.UNIVERSE_TOP_N)
+    universe_parser.add_argument("--out", type=str, help="Also write per-event group stats (every minute) to this CSV", default=None)
+
+    lead_lag_parser = commands.add_parser("lead-lag", help="Which asset moves first: lead-lag cross-correlations for every asset pair, per event type")
+    add_calendar_arguments(lead_lag_parser, subcommand=True)
+    lead_lag_parser.add_argument("--max-lag", type=int, help="Largest lead/lag in minutes", default=config.LEAD_LAG_MAX_MINUTES)
+    lead_lag_parser.add_argument("--top", type=int, help="Pairs to show per event type", default=10)
+    lead_lag_parser.add_argument("--out", type=str, help="Directory for the per-event-type matrices (CSV)", default="lead_lag")
+
+    surprise_parser = commands.add_parser("surprise", help="Average reactions by surprise bucket and betas of each asset's move on the standardized surprise")
+    add_calendar_arguments(surprise_parser, subcommand=True)
+    surprise_parser.add_argument("--horizon", type=int, action="append", help="Minutes after release for the betas (repeatable, default: 1 5 15 60)")
+    surprise_parser.add_argument("--out", type=str, help="Also write events, bucket paths and betas as CSV files to this directory", default=None)
+
+    serve_parser = commands.add_parser("serve", help="Answer calendar, impact and chart requests over HTTP from one warm process")
+    serve_parser.add_argument("--host", type=str, help=f"Interface to listen on (default: {config.SERVICE_HOST})", default=config.SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, help=f"Port to listen on (default: {config.SERVICE_PORT})", default=config.SERVICE_PORT)
+    serve_parser.add_argument("--workers", type=int, help=f"Threads for fetching and rendering (default: {config.SERVICE_WORKERS})", default=config.SERVICE_WORKERS)
+
+    commands.add_parser("compile-calendar", help="Build the date-sorted calendar file from events.csv for fast loading")
+
+    query_parser = commands.add_parser("query", help="Filter stored reaction metrics (no network)")
+    query_parser.add_argument("--event", type=str, help="Event name contains (e.g., 'Non-Farm')")
+    query_parser.add_argument("--asset", type=str, help="Asset name or ticker contains (e.g., 'Rates' or 'TNX')")
+    query_parser.add_argument("--since", type=str, help="First date to include (YYYY-MM-DD)")
+    query_parser.add_argument("--until", type=str, help="Last date to include (YYYY-MM-DD)")
+    query_parser.add_argument("--min", action="append", metavar="METRIC=VALUE", help="Keep rows with METRIC >= VALUE")
+    query_parser.add_argument("--max", action="append", metavar="METRIC=VALUE", help="Keep rows with METRIC <= VALUE")
+    query_parser.add_argument("--min-abs", action="append", metavar="METRIC=VALUE", help="Keep rows with |METRIC| >= VALUE")
+    query_parser.add_argument("--sort", type=str, help="Sort by a metric (e.g., 'max_abs_move')")
+    query_parser.add_argument("--desc", action="store_true", help="Sort in descending order")
+    query_parser.add_argument("--limit", type=int, help="Show at most N rows")
+    query_parser.epilog = f"Metrics (% change from release baseline): {', '.join(METRIC_COLUMNS)}"
+
+    return parser
+
+def load_calendar(args, interactive=True, include_future=False):
+    """
+    Loads the economic calendar and applies the --date/--days/--event filters:
+    --date alone is that day, --days widens it to a range around --date (or today).
+    Returns only events whose market data can exist (not in the future),
+    unless include_future is set.
+    """
+    # Choose how the local bar cache is used for this run
+    if args.no_cache:
+        config.BAR_CACHE_MODE = "off"
+    elif args.refresh_cache:
+        config.BAR_CACHE_MODE = "refresh"
+
+    # Determine date range: --days either side of --date, or of today without one
+    if args.date or args.days:
+        target_date = datetime.strptime(args.date, '%Y-%m-%d') if args.date else datetime.now(pytz.utc)
         start_date = (target_date - timedelta(days=args.days)).strftime('%Y-%m-%d')
         end_date = (target_date + timedelta(days=args.days)).strftime('%Y-%m-%d')
     else:
         start_date = None
         end_date = None
-    
+
     # Check if we have an API key
     api_key = config.FMP_API_KEY
-    
-    if not api_key:
+
+    if not api_key and interactive:
         print("\n--- API Setup ---")
         use_api = input("Do you have an FMP API key? (y/n): ").lower().strip()
         if use_api == 'y':
             api_key = input("Enter your FMP API key: ").strip()
-    
+
     if api_key:
         print(f"Using API Key: {api_key[:5]}...")
     else:
@@ -41,54 +154,269 @@ def main():
 
     print(f"Loading economic events...")
     calendar_df = fetch_economic_calendar(start_date=start_date, end_date=end_date, api_key=api_key)
-    
+
     if calendar_df.empty:
         print("No events found in events.csv")
-        return
+        return calendar_df
 
-    # Filter by date if user asked for a specific day
-    if args.date:
+    # Filter by date if user asked for a specific day (--days asks for the whole range)
+    if args.date and not args.days:
         calendar_df = calendar_df[calendar_df['date'].dt.strftime('%Y-%m-%d') == args.date]
         print(f"Filtering for events on {args.date}...")
-    
+    elif args.days:
+        print(f"Including events from {start_date} to {end_date}...")
+
     # Filter by event name if provided
     if args.event:
         calendar_df = calendar_df[calendar_df['event'].str.contains(args.event, case=False, na=False)]
-        
+
     if calendar_df.empty:
         print(f"No events matching your criteria.")
-        return
-        
+        return calendar_df
+
     print(f"Found {len(calendar_df)} events.")
-    
+
+    if include_future:
+        return calendar_df
+
+    # We can't analyze future events because market data doesn't exist yet
+    is_future = calendar_df['date'] > datetime.now(pytz.utc)
+    for index, row in calendar_df[is_future].iterrows():
+        print(f"\n--- Skipping {row['country']} {row['event']} ({row['date']} UTC) ---")
+        print("Event is in the future. Cannot fetch market impact yet.")
+    return calendar_df[~is_future]
+
+def run_list(calendar_df):
+    """
+    Prints the matching events and the planned downloads. Stays on the calendar
+    side: yfinance and plotly are never imported.
+    """
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(calendar_df[['date', 'country', 'event', 'actual', 'estimate']].to_string(index=False))
+
+    plans = plan_fetches(calendar_df)
+    todo = [plan for plan in plans if plan['tickers']]
+    print(f"\n{len(plans)} download windows, {len(todo)} to fetch "
+          f"({len(plans) - len(todo)} fully stored):")
+    for plan in plans:
+        if not plan['tickers']:
+            fetch = "stored"
+        elif plan['interval'] is None:
+            fetch = "unavailable (too old for a usable interval)"
+        else:
+            fetch = f"{len(plan['tickers'])} tickers at {plan['interval']}"
+        print(f"  {plan['start']:%Y-%m-%d %H:%M} - {plan['end']:%H:%M} UTC | "
+              f"{len(plan['events'])} events | {fetch}")
+
+def run_batch(args, calendar_df):
+    from report import write_reports
+    formats = tuple(f.strip().lower() for f in args.format.split(',') if f.strip())
+    count = write_reports(
+        iter_impacts(calendar_df, workers=args.workers),
+        args.out,
+        formats=formats,
+        workers=args.render_workers
+    )
+    print(f"\nWrote {count} event reports to {args.out}")
+
+def run_live_mode(args):
+    from live import run_live
+    calendar_df = load_calendar(args, include_future=True)
+    if calendar_df.empty:
+        return
+
+    # Watch the next release whose analysis window hasn't finished yet
+    window_open = calendar_df['date'] + timedelta(minutes=config.POST_EVENT_MINUTES) > datetime.now(pytz.utc)
+    upcoming = calendar_df[window_open].sort_values('date')
+    if upcoming.empty:
+        print("No upcoming or in-progress events to watch live.")
+        return
+
+    row = upcoming.iloc[0]
+    print(f"\n--- Live: {row['country']} {row['event']} ({row['date']} UTC) ---")
+    run_live(row, port=args.port)
+
+def run_charts(args):
+    if args.live:
+        run_live_mode(args)
+        return
+
+    calendar_df = load_calendar(args, interactive=not (args.batch or args.list))
+    if calendar_df.empty:
+        return
+
+    if args.list:
+        run_list(calendar_df)
+        return
+
+    if args.batch:
+        run_batch(args, calendar_df)
+        return
+
+    if args.stream:
+        run_stream(args, calendar_df)
+        return
+
+    from visualizer import plot_event_impact
+
     # Loop through each event found
-    try:
-        for index, row in calendar_df.iterrows():
-            print(f"\n--- Processing {row['country']} {row['event']} ({row['date']} UTC) ---")
-            
-            # We can't analyze future events because market data doesn't exist yet
-            if row['date'] > datetime.now(pytz.utc):
-                print("Event is in the future. Cannot fetch market impact yet.")
-                continue
-                
-            impact_data = calculate_impact(row)
-            
-            if not impact_data:
+    # Events on the same morning share one download (see analyzer.plan_event_windows)
+    # With --workers N every event is fetched in the background while charts are shown in order
+    for index, row, impact_data in iter_impacts(calendar_df, workers=args.workers):
+        print(f"\n--- Processing {row['country']} {row['event']} ({row['date']} UTC) ---")
+
+        if not impact_data:
+            print("No market data available for this event.")
+            continue
+
+        # Create and show the interactive chart
+        fig, config_options = plot_event_impact(row, impact_data)
+        fig.show(config=config_options)
+
+        # If there are more events, ask before showing the next one
+        if len(calendar_df) > 1:
+            cont = input("Press Enter to see next event, or 'q' to quit: ")
+            if cont.lower() == 'q':
+                break
+
+def run_stream(args, calendar_df):
+    from live import run_progressive
+    # Within one event the asset chunks download in parallel (YAHOO_MAX_CONCURRENT unless --workers says more)
+    workers = args.workers if args.workers > 1 else None
+    for index, row in calendar_df.iterrows():
+        print(f"\n--- Processing {row['country']} {row['event']} ({row['date']} UTC) ---")
+        session, server = run_progressive(row, port=args.port, workers=workers)
+        try:
+            if not session.results:
                 print("No market data available for this event.")
+            if len(calendar_df) == 1:
+                input("Press Enter to close the chart...")
                 continue
-                
-            # Create and show the interactive chart
-            fig, config_options = plot_event_impact(row, impact_data)
-            fig.show(config=config_options)
-            
-            # If there are more events, ask before showing the next one
-            if len(calendar_df) > 1:
-                cont = input("Press Enter to see next event, or 'q' to quit: ")
-                if cont.lower() == 'q':
-                    break
+            cont = input("Press Enter to see next event, or 'q' to quit: ")
+            if cont.lower() == 'q':
+                break
+        finally:
+            server.shutdown()
+
+def run_index(args):
+    calendar_df = load_calendar(args, interactive=False)
+    if calendar_df.empty:
+        return
+
+    study = calculate_event_study(calendar_df, workers=args.workers)
+    stored = store_metrics(compute_reaction_metrics(study))
+    print(f"\nIndexed {stored} event x asset reactions from {len(study)} events.")
+
+def run_lead_lag(args):
+    calendar_df = load_calendar(args, interactive=False)
+    if calendar_df.empty:
+        return
+
+    study = calculate_event_study(calendar_df, workers=args.workers)
+    lead_lag = compute_lead_lag(study, max_lag=args.max_lag)
+    print(f"\n{lead_lag}")
+    print_lead_lag(lead_lag, top=args.top)
+    count = write_lead_lag(lead_lag, args.out)
+    print(f"\nWrote lead-lag matrices for {count} event types to {args.out}")
+
+def run_surprise(args):
+    calendar_df = load_calendar(args, interactive=False)
+    if calendar_df.empty:
+        return
+
+    study = calculate_event_study(calendar_df, workers=args.workers)
+    print(f"\n{study}")
+    print_surprise(study, horizons=args.horizon)
+    if args.out:
+        write_surprise(study, args.out, horizons=args.horizon)
+        print(f"\nWrote surprise tables to {args.out}")
+
+def run_query(args):
+    try:
+        results = query_metrics(
+            event=args.event,
+            asset=args.asset,
+            since=args.since,
+            until=args.until,
+            min_values=parse_thresholds(args.min),
+            max_values=parse_thresholds(args.max),
+            min_abs=parse_thresholds(args.min_abs),
+            sort=f"-{args.sort}" if args.sort and args.desc else args.sort,
+            limit=args.limit
+        )
+    except ValueError as e:
+        print(f"Query error: {e}")
+        return
+
+    if results.empty:
+        print("No stored reactions match. Run 'python main.py index' first to build the index.")
+        return
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(results.to_string(index=False))
+    print(f"\n{len(results)} rows")
+
+def run_universe(args):
+    universe = load_universe(args.universe)
+    print(f"Universe: {universe}")
+
+    calendar_df = load_calendar(args, interactive=False)
+    if calendar_df.empty:
+        return
+
+    frames = []
+    for index, row, section in iter_cross_sections(calendar_df, universe, workers=args.workers, top_n=args.top):
+        print_cross_section(section)
+        if args.out:
+            frames.append(section.to_frame().assign(event=row['event'], date=row['date']))
+
+    if frames:
+        pd.concat(frames, ignore_index=True).to_csv(args.out, index=False)
+        print(f"\nWrote group stats to {args.out}")
+
+def run_serve(args):
+    from service import serve
+    serve(host=args.host, port=args.port, api_key=config.FMP_API_KEY, workers=args.workers)
+
+def run_compile_calendar(args):
+    count = compile_calendar()
+    print(f"Compiled {count} events into {calendar_store.compiled_path()}")
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    check_top_level_options(parser, args, sys.argv[1:])
+
+    profiling = getattr(args, 'profile', False) or getattr(args, 'profile_out', None)
+    if profiling:
+        profiler.enable()
+
+    try:
+        if args.command == "query":
+            run_query(args)
+        elif args.command == "index":
+            run_index(args)
+        elif args.command == "universe":
+            run_universe(args)
+        elif args.command == "lead-lag":
+            run_lead_lag(args)
+        elif args.command == "surprise":
+            run_surprise(args)
+        elif args.command == "serve":
+            run_serve(args)
+        elif args.command == "compile-calendar":
+            run_compile_calendar(args)
+        else:
+            run_charts(args)
     except KeyboardInterrupt:
         print("\n\nExiting program... Goodbye!")
         sys.exit(0)
+    finally:
+        if profiling:
+            profiler.print_summary()
+            if args.profile_out:
+                profiler.write_jsonl(args.profile_out)
+                print(f"Profile records appended to {args.profile_out}")
 
 if __name__ == "__main__":
     main()
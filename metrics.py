@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import warnings
+import contextlib
+import numpy as np
+import pandas as pd
+import config
+
+# Minutes after the release at which we record the move
+HORIZONS = (1, 5, 15, 60)
+
+METRIC_COLUMNS = (
+    ['max_abs_move', 'peak_move', 'time_to_peak']
+    + [f'move_{h}' for h in HORIZONS]
+    + ['vol_pre', 'vol_post', 'n_bars']
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS reactions (
+    event TEXT NOT NULL,
+    country TEXT,
+    date TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    ticker TEXT,
+    {', '.join(f'{c} REAL' for c in METRIC_COLUMNS)},
+    PRIMARY KEY (event, date, asset)
+);
+CREATE INDEX IF NOT EXISTS reactions_asset_date ON reactions (asset, date);
+CREATE INDEX IF NOT EXISTS reactions_event_asset ON reactions (event, asset);
+"""
+
+def _realized_vol(values, in_window):
+    """
+    Realized volatility (event, asset) over the grid minutes where in_window is True,
+    from log returns between each bar and the previous bar inside the window.
+    """
+    window = values[:, :, in_window]
+    has_bar = ~np.isnan(window)
+    # Carry the last real bar forward, then keep only the steps that land on a real bar
+    last = np.where(has_bar, np.arange(window.shape[2]), 0)
+    np.maximum.accumulate(last, axis=2, out=last)
+    log_level = np.log1p(window / 100)
+    previous = np.take_along_axis(log_level, last, axis=2)[:, :, :-1]
+    returns = np.where(has_bar[:, :, 1:], log_level[:, :, 1:] - previous, np.nan) * 100
+
+    vol = np.sqrt(np.nansum(returns ** 2, axis=2))
+    return np.where(has_bar.sum(axis=2) >= 2, vol, np.nan)
+
+def compute_reaction_metrics(study):
+    """
+    Computes reaction metrics for every (event, asset) of an EventStudy in one vectorized pass.
+    All moves are in % change from the event-time baseline; times are minutes after release.
+    Returns one row per event x asset that has at least one bar.
+    """
+    values = study.values
+    minutes = study.minutes
+    post = minutes >= 0
+
+    with warnings.catch_warnings():
+        # All-NaN slices (an asset with no bars for an event) quietly become NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+
+        # Biggest move after the release, either direction, and when it happened
+        abs_post = np.abs(values[:, :, post])
+        peak_col = np.argmax(np.nan_to_num(abs_post, nan=-1.0), axis=2)
+        peak_move = np.take_along_axis(values[:, :, post], peak_col[:, :, None], axis=2)[:, :, 0]
+        max_abs_move = np.nanmax(abs_post, axis=2)
+        time_to_peak = minutes[post][peak_col].astype(float)
+        time_to_peak[np.isnan(max_abs_move)] = np.nan
+
+        # Move at each horizon, using the last bar at or before it (5m bars, gaps)
+        filled = study.filled().values
+        moves = {}
+        for h in HORIZONS:
+            col = np.searchsorted(minutes, h, side='right') - 1
+            if col < 0 or h > minutes[-1]:
+                # Horizon is beyond the analysis window
+                moves[f'move_{h}'] = np.full(values.shape[:2], np.nan)
+            else:
+                moves[f'move_{h}'] = filled[:, :, col]
+
+        # Realized volatility: sqrt of summed squared log returns between consecutive bars
+        # that exist (so 5m bars on the 1m grid count), in %; NaN with fewer than 2 bars
+        vol_pre = _realized_vol(values, minutes <= 0)
+        vol_post = _realized_vol(values, minutes >= 0)
+
+    n_bars = (~np.isnan(values)).sum(axis=2)
+
+    n_events, n_assets = values.shape[:2]
+    event_pos = np.repeat(np.arange(n_events), n_assets)
+    events = study.events
+
+    df = pd.DataFrame({
+        'event': events['event'].to_numpy()[event_pos],
+        'country': events['country'].to_numpy()[event_pos] if 'country' in events else None,
+        'date': pd.DatetimeIndex(events['date']).tz_convert('UTC')[event_pos],
+        'asset': np.tile(study.assets, n_events),
+        'ticker': np.tile([config.ASSETS.get(a) for a in study.assets], n_events),
+        'max_abs_move': max_abs_move.ravel(),
+        'peak_move': peak_move.ravel(),
+        'time_to_peak': time_to_peak.ravel(),
+        **{name: move.ravel() for name, move in moves.items()},
+        'vol_pre': vol_pre.ravel(),
+        'vol_post': vol_post.ravel(),
+        'n_bars': n_bars.ravel(),
+    })
+    return df[df['n_bars'] > 0].reset_index(drop=True)
+
+def _index_path():
+    return os.path.join(config.CACHE_DIR, 'metrics.sqlite')
+
+@contextlib.contextmanager
+def _connect(path=None):
+    path = path or _index_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.executescript(_SCHEMA)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+def store_metrics(metrics_df, path=None):
+    """
+    Upserts computed metrics into the local reactions table.
+    """
+    if metrics_df.empty:
+        return 0
+
+    columns = ['event', 'country', 'date', 'asset', 'ticker'] + METRIC_COLUMNS
+    rows = metrics_df[columns].copy()
+    rows['date'] = rows['date'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    rows = rows.astype(object).where(rows.notna(), None)
+
+    with _connect(path) as conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO reactions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows.itertuples(index=False, name=None)
+        )
+    return len(rows)
+
+def query_metrics(event=None, asset=None, since=None, until=None, min_values=None,
+                  max_values=None, min_abs=None, sort=None, limit=None, path=None):
+    """
+    Filters the reactions table without touching the network.
+    event/asset match by case-insensitive substring; since/until are dates (YYYY-MM-DD).
+    min_values/max_values/min_abs map metric names to thresholds, e.g. {'move_5': 0.1}.
+    sort is a metric name, '-' prefix for descending.
+    """
+    clauses, params = [], []
+
+    if event:
+        clauses.append("event LIKE ?")
+        params.append(f"%{event}%")
+    if asset:
+        clauses.append("(asset LIKE ? OR ticker LIKE ?)")
+        params.extend([f"%{asset}%", f"%{asset}%"])
+    if since:
+        clauses.append("date >= ?")
+        params.append(pd.Timestamp(since).strftime('%Y-%m-%d'))
+    if until:
+        clauses.append("date < ?")
+        params.append((pd.Timestamp(until) + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+
+    for template, thresholds in [("{} >= ?", min_values), ("{} <= ?", max_values), ("ABS({}) >= ?", min_abs)]:
+        for metric, value in (thresholds or {}).items():
+            if metric not in METRIC_COLUMNS:
+                raise ValueError(f"Unknown metric '{metric}'. Choose from: {', '.join(METRIC_COLUMNS)}")
+            clauses.append(template.format(metric))
+            params.append(float(value))
+
+    sql = "SELECT * FROM reactions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+
+    if sort:
+        metric = sort.lstrip('-')
+        if metric not in METRIC_COLUMNS + ['date', 'event', 'asset']:
+            raise ValueError(f"Cannot sort by '{metric}'")
+        sql += f" ORDER BY {metric} {'DESC' if sort.startswith('-') else 'ASC'}"
+    else:
+        sql += " ORDER BY date, event, asset"
+
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    with _connect(path) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
@@ -0,0 +1,154 @@
+import json
+import time
+import uuid
+import threading
+import functools
+import contextlib
+from datetime import datetime
+import pandas as pd
+import pytz
+
+# Off by default: stage() and count() then cost next to nothing
+_enabled = False
+_records = []
+_lock = threading.Lock()
+_run_id = None
+
+def enable():
+    """
+    Starts recording stage timings for this run.
+    """
+    global _enabled, _run_id
+    _enabled = True
+    _run_id = uuid.uuid4().hex[:12]
+
+def is_enabled():
+    return _enabled
+
+def _add(record):
+    with _lock:
+        _records.append(record)
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """
+    Times a block of work. The yielded dict can be updated with extra fields
+    (rows, bytes, ticker, ...) that end up in the record.
+
+        with profiler.stage("yf_download", ticker="SPY") as info:
+            df = ...
+            info['rows'] = len(df)
+    """
+    info = dict(fields)
+    if not _enabled:
+        yield info
+        return
+
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info['stage'] = name
+        info['seconds'] = time.perf_counter() - started
+        info['at'] = datetime.now(pytz.utc).isoformat()
+        info['thread'] = threading.current_thread().name
+        _add(info)
+
+def count(name, **fields):
+    """
+    Records a zero-duration event, e.g. cache hits or retries.
+    """
+    if _enabled:
+        _add({'stage': name, 'seconds': 0.0, 'at': datetime.now(pytz.utc).isoformat(), **fields})
+
+def timed(name):
+    """
+    Decorator version of stage() for whole functions.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def frame_bytes(df):
+    """
+    In-memory size of a downloaded DataFrame (0 for None/empty).
+    """
+    if df is None or df.empty:
+        return 0
+    return int(df.memory_usage(deep=True).sum())
+
+def records():
+    with _lock:
+        return list(_records)
+
+def summary():
+    """
+    Per-stage totals: calls, wall time, rows/bytes fetched, cache hits and retries.
+    """
+    df = pd.DataFrame(records())
+    if df.empty:
+        return df
+
+    for column in ['rows', 'bytes', 'hits', 'misses', 'retries']:
+        if column not in df:
+            df[column] = 0
+    df[['rows', 'bytes', 'hits', 'misses', 'retries']] = df[['rows', 'bytes', 'hits', 'misses', 'retries']].fillna(0)
+
+    table = df.groupby('stage').agg(
+        calls=('seconds', 'size'),
+        total_s=('seconds', 'sum'),
+        mean_ms=('seconds', lambda s: s.mean() * 1000),
+        max_ms=('seconds', lambda s: s.max() * 1000),
+        rows=('rows', 'sum'),
+        mb=('bytes', lambda s: s.sum() / 1e6),
+        hits=('hits', 'sum'),
+        misses=('misses', 'sum'),
+        retries=('retries', 'sum'),
+    )
+    counts = ['rows', 'hits', 'misses', 'retries']
+    table[counts] = table[counts].astype(int)
+    return table.sort_values('total_s', ascending=False)
+
+def ticker_summary():
+    """
+    Per-ticker download time and rows (single-ticker downloads and retries).
+    """
+    df = pd.DataFrame(records())
+    if df.empty or 'ticker' not in df:
+        return pd.DataFrame()
+
+    df = df[df['ticker'].notna()].copy()
+    if 'rows' not in df:
+        df['rows'] = 0
+    return df.groupby(['stage', 'ticker']).agg(
+        calls=('seconds', 'size'),
+        total_s=('seconds', 'sum'),
+        rows=('rows', 'sum'),
+    ).sort_values('total_s', ascending=False)
+
+def print_summary():
+    table = summary()
+    if table.empty:
+        print("\nProfile: nothing recorded.")
+        return
+
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.float_format', '{:.3f}'.format):
+        print("\n--- Profile (by stage) ---")
+        print(table.to_string())
+
+        tickers = ticker_summary()
+        if not tickers.empty:
+            print("\n--- Profile (by ticker, top 20) ---")
+            print(tickers.head(20).to_string())
+
+def write_jsonl(path):
+    """
+    Appends this run's raw records to a JSON lines file, one record per line.
+    """
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records():
+            f.write(json.dumps({'run_id': _run_id, **record}, default=str) + "\n")
@@ -0,0 +1,119 @@
+import os
+import re
+import html
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from plotly.offline import get_plotlyjs
+import profiler
+from impact_series import as_impact_series
+from visualizer import plot_event_impact
+
+# Every report points at this one file instead of embedding ~3 MB of plotly.js
+PLOTLY_BUNDLE = "plotly.min.js"
+
+def report_name(event_row):
+    """
+    File-system friendly base name, e.g. '20251001_1345_us-pmi-flash'.
+    """
+    date = pd.Timestamp(event_row['date'])
+    slug = re.sub(r'[^a-z0-9]+', '-', str(event_row['event']).lower()).strip('-')
+    return f"{date:%Y%m%d_%H%M}_{slug}"
+
+def impact_to_frame(impact_data):
+    """
+    Long-format table of one event's impact: asset, interval, time, minutes_relative, pct_change.
+    """
+    columns = ['asset', 'interval', 'time', 'minutes_relative', 'pct_change']
+    frames = []
+    for asset_name, series in impact_data.items():
+        series = as_impact_series(series)
+        frames.append(series.to_frame().assign(asset=asset_name, interval=series.interval))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+def write_shared_bundle(out_dir):
+    """
+    Writes plotly.js once into the output directory (skipped if already there).
+    """
+    path = os.path.join(out_dir, PLOTLY_BUNDLE)
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+    return path
+
+def render_report(event_row, impact_data, out_dir, formats=('html',)):
+    """
+    Writes one event's chart (HTML and/or PNG) and its impact data (CSV).
+    Runs inside a worker process; returns the list of files written.
+    """
+    name = report_name(event_row)
+    written = []
+
+    data_path = os.path.join(out_dir, f"{name}.csv")
+    impact_to_frame(impact_data).to_csv(data_path, index=False)
+    written.append(data_path)
+
+    fig, config_options = plot_event_impact(event_row, impact_data)
+
+    if 'html' in formats:
+        html_path = os.path.join(out_dir, f"{name}.html")
+        fig.write_html(html_path, include_plotlyjs=PLOTLY_BUNDLE, full_html=True, config=config_options)
+        written.append(html_path)
+
+    if 'png' in formats:
+        png_path = os.path.join(out_dir, f"{name}.png")
+        try:
+            # Static export needs the optional 'kaleido' package
+            fig.write_image(png_path, width=1400, height=800)
+            written.append(png_path)
+        except Exception as e:
+            print(f"  PNG export failed for {name} (requires the kaleido package): {e!r}")
+
+    return written
+
+def _write_index(out_dir, entries):
+    """
+    Writes index.html linking every report in the batch.
+    """
+    rows = "\n".join(
+        f'<li><a href="{html.escape(name)}.html">{html.escape(str(row["event"]))}</a> '
+        f'({html.escape(str(row["date"]))} UTC) - <a href="{html.escape(name)}.csv">data</a></li>'
+        for name, row in entries
+    )
+    with open(os.path.join(out_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Event Reports</title></head>"
+                f"<body><h1>Event Reports</h1><ul>\n{rows}\n</ul></body></html>\n")
+
+def write_reports(results, out_dir, formats=('html',), workers=None):
+    """
+    Renders reports for (index, event_row, impact_data) results on a process pool.
+    Jobs are submitted as results arrive, so rendering overlaps with fetching.
+    Returns the number of reports written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if 'html' in formats:
+        write_shared_bundle(out_dir)
+
+    entries = []
+    # Workers are started while the fetch threads are running; a forked child could
+    # inherit a lock one of them holds (or the swapped-out sys.stderr), so spawn them
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = []
+        for index, event_row, impact_data in results:
+            if not impact_data:
+                print(f"No market data available for {event_row['event']} ({event_row['date']} UTC).")
+                continue
+            futures.append(pool.submit(render_report, event_row, impact_data, out_dir, formats))
+            entries.append((report_name(event_row), event_row))
+
+        # Rendering happens in other processes; we time how long we wait on them here
+        with profiler.stage("render_wait", rows=len(futures)):
+            for future in futures:
+                for path in future.result():
+                    print(f"  Wrote {path}")
+
+    if 'html' in formats:
+        _write_index(out_dir, entries)
+    return len(entries)
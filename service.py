@@ -0,0 +1,299 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+import pytz
+from plotly.offline import get_plotlyjs
+import config
+from data_loader import fetch_economic_calendar
+from analyzer import calculate_impacts
+from impact_cache import event_fingerprint
+from visualizer import plot_event_impact
+
+_INDEX = {
+    "endpoints": {
+        "/calendar?start=YYYY-MM-DD&end=YYYY-MM-DD&event=CPI": "Filtered calendar; each event has an id",
+        "/impact?id=ID (or ?event=CPI&date=YYYY-MM-DD)": "Per-asset % change from the release baseline",
+        "/chart?id=ID (or ?event=CPI&date=YYYY-MM-DD)": "Interactive chart (HTML)",
+        "/stats": "Cache hits, misses and requests that joined one already in flight"
+    }
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class WarmCache:
+    """
+    Finished results in an LRU (at most max_entries, each kept for ttl_seconds), plus
+    the computations still running. A request for a key that is already being computed
+    waits for that computation instead of starting its own, so N analysts asking for
+    the same CPI release at once cause one download. Failures are not cached.
+    Only used from the event loop thread, so it needs no locks.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = max_entries or config.SERVICE_CACHE_ENTRIES
+        self.ttl_seconds = ttl_seconds or config.SERVICE_CACHE_TTL_MINUTES * 60
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key, compute):
+        """
+        Returns the value for key, running the coroutine function compute() only if it is
+        neither cached nor already running.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.joined += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # A client that disconnects must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'in_flight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'joined': self.joined
+        }
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _rounded(values):
+    return [None if np.isnan(v) else round(v, 4) for v in np.asarray(values, dtype=float).tolist()]
+
+class QueryService:
+    """
+    One warm process answering calendar, impact and chart requests for many users.
+
+    Everything blocking (calendar loading, Yahoo downloads, normalizing, rendering)
+    runs on a thread pool; the data_loader concurrency and rate limits are shared
+    by all requests, and the on-disk bar/impact caches back the in-memory one.
+    """
+
+    def __init__(self, api_key=None, workers=None):
+        self.api_key = api_key
+        self.cache = WarmCache()
+        self.events = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers or config.SERVICE_WORKERS)
+        self._plotly_js = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def calendar(self, start_date=None, end_date=None):
+        """
+        The calendar for a date range (None = everything available). Every event
+        seen is remembered by id so /impact and /chart can find it later.
+        """
+        async def compute():
+            df = await self._run(fetch_economic_calendar, start_date, end_date, self.api_key)
+            ids = [event_fingerprint(row) for _, row in df.iterrows()]
+            return df.assign(id=ids) if not df.empty else df.assign(id=pd.Series(dtype=str))
+
+        df = await self.cache.get(('calendar', start_date, end_date), compute)
+        for event_id, (_, row) in zip(df['id'], df.iterrows()):
+            self.events[event_id] = row
+        return df
+
+    async def find_event(self, query):
+        """
+        Resolves ?id=... or ?event=...&date=YYYY-MM-DD to a calendar row.
+        """
+        event_id = query.get('id')
+        if event_id:
+            if event_id not in self.events:
+                await self.calendar()
+            if event_id not in self.events:
+                raise HTTPError(404, f"Unknown event id {event_id}")
+            return self.events[event_id]
+
+        name, date = query.get('event'), query.get('date')
+        if not name or not date:
+            raise HTTPError(400, "Pass id, or event and date (YYYY-MM-DD)")
+        df = await self.calendar(date, date)
+        matches = df[(df['date'].dt.strftime('%Y-%m-%d') == date) &
+                     df['event'].str.contains(name, case=False, na=False, regex=False)] if not df.empty else df
+        if matches.empty:
+            raise HTTPError(404, f"No '{name}' event on {date}")
+        return matches.iloc[0]
+
+    async def impact(self, row):
+        """
+        {asset_name: ImpactSeries} for one event, computed once per id while cached.
+        """
+        if row['date'] > datetime.now(pytz.utc):
+            raise HTTPError(409, "Event is in the future; there is no market data yet")
+
+        async def compute():
+            frame = pd.DataFrame([row]).drop(columns='id')
+            return (await self._run(calculate_impacts, frame))[row.name]
+
+        return await self.cache.get(('impact', row['id']), compute)
+
+    async def chart(self, row):
+        """
+        The event chart as a standalone HTML page (plotly.js served from /plotly.min.js).
+        """
+        async def compute():
+            impact_data = await self.impact(row)
+            if not impact_data:
+                raise HTTPError(404, "No market data available for this event")
+
+            def render():
+                fig, config_options = plot_event_impact(row, impact_data)
+                return fig.to_html(full_html=True, include_plotlyjs='/plotly.min.js', config=config_options)
+
+            return await self._run(render)
+
+        return await self.cache.get(('chart', row['id']), compute)
+
+    async def route(self, path, query):
+        """
+        Returns (content_type, body) for one GET request.
+        """
+        if path == '/':
+            return 'application/json', json.dumps(_INDEX)
+
+        if path == '/stats':
+            return 'application/json', json.dumps({**self.cache.stats(), 'events_known': len(self.events)})
+
+        if path == '/plotly.min.js':
+            if self._plotly_js is None:
+                self._plotly_js = get_plotlyjs()
+            return 'application/javascript', self._plotly_js
+
+        if path == '/calendar':
+            df = await self.calendar(query.get('start'), query.get('end'))
+            if not df.empty and query.get('event'):
+                df = df[df['event'].str.contains(query['event'], case=False, na=False, regex=False)]
+            columns = [c for c in ('id', 'date', 'country', 'event', 'actual', 'estimate', 'previous') if c in df.columns]
+            events = [{c: _json_value(row[c]) for c in columns} for _, row in df.iterrows()]
+            return 'application/json', json.dumps({'count': len(events), 'events': events})
+
+        if path == '/impact':
+            row = await self.find_event(query)
+            impact_data = await self.impact(row)
+            return 'application/json', json.dumps({
+                'id': row['id'],
+                'event': row['event'],
+                'country': _json_value(row.get('country')),
+                'date': row['date'].isoformat(),
+                'assets': {
+                    asset_name: {
+                        'ticker': config.ASSETS.get(asset_name),
+                        'interval': series.interval,
+                        'minutes_relative': series.minutes_relative.tolist(),
+                        'pct_change': _rounded(series.pct_change)
+                    }
+                    for asset_name, series in impact_data.items()
+                }
+            })
+
+        if path == '/chart':
+            row = await self.find_event(query)
+            return 'text/html; charset=utf-8', await self.chart(row)
+
+        raise HTTPError(404, f"No such endpoint: {path}")
+
+    async def handle(self, reader, writer):
+        """
+        One HTTP/1.1 GET per connection (Connection: close).
+        """
+        status, content_type, body = 200, 'application/json', ''
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            # Headers carry nothing we need
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.split()
+            if len(parts) != 3:
+                raise HTTPError(400, "Bad request line")
+            if parts[0] != 'GET':
+                raise HTTPError(405, "Only GET is supported")
+
+            url = urlsplit(parts[1])
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            content_type, body = await self.route(url.path, query)
+        except HTTPError as e:
+            status, content_type, body = e.status, 'application/json', json.dumps({'error': str(e)})
+        except Exception as e:
+            print(f"  Error serving request: {e}")
+            status, content_type, body = 500, 'application/json', json.dumps({'error': str(e)})
+
+        payload = body.encode('utf-8')
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                  409: 'Conflict', 500: 'Internal Server Error'}.get(status, 'Error')
+        header = (f"HTTP/1.1 {status} {reason}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Content-Length: {len(payload)}\r\n"
+                  f"Connection: close\r\n\r\n").encode('latin-1')
+        try:
+            writer.write(header + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+async def _serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Serving on http://{host}:{port}/ (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+def serve(host=None, port=None, api_key=None, workers=None):
+    """
+    Runs the query service until interrupted.
+    """
+    service = QueryService(api_key=api_key, workers=workers)
+    try:
+        asyncio.run(_serve(service, host or config.SERVICE_HOST, config.SERVICE_PORT if port is None else port))
+    finally:
+        service.close()
@@ -0,0 +1,171 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import config
+from metrics import HORIZONS
+
+# "3.2%", "-0.1", "250K", "$1.2B", "1,234.5": sign, optional currency sign, number, unit
+_VALUE_PATTERN = r'^([-+]?)\$?(\d*\.?\d+(?:[eE][-+]?\d+)?)([KMBT%]?)$'
+_UNITS = {'': 1.0, '%': 1.0, 'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+
+def parse_values(values):
+    """
+    Turns calendar strings such as "3.2%", "55.3", "250K" or "-1.2B" into floats in one
+    vectorized pass. K/M/B/T are expanded (so "250K" and "0.25M" compare equal) and
+    percentages stay in percentage points. Anything else ("Wait for release", blanks) is NaN.
+    """
+    text = (pd.Series(values, dtype=object).astype(str).str.strip().str.upper()
+            .str.replace('−', '-', regex=False)
+            .str.replace(r'[,\s]', '', regex=True))
+    parts = text.str.extract(_VALUE_PATTERN)
+    number = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype=float)
+    sign = np.where(parts[0].to_numpy(dtype=object) == '-', -1.0, 1.0)
+    scale = parts[2].map(_UNITS).to_numpy(dtype=float)
+    return sign * number * scale
+
+def add_surprise(events):
+    """
+    Returns a copy of a calendar DataFrame with parsed actual_value, estimate_value and
+    previous_value, the surprise (actual - estimate), surprise_z (the surprise divided by
+    the typical size of that event's surprises, so CPI and payrolls are comparable)
+    and surprise_bucket (config.SURPRISE_BUCKETS on surprise_z).
+    Event types with fewer than config.SURPRISE_MIN_EVENTS parsed surprises get no z.
+    """
+    df = events.copy()
+    for column in ('actual', 'estimate', 'previous'):
+        df[f'{column}_value'] = parse_values(df[column]) if column in df else np.nan
+
+    df['surprise'] = df['actual_value'] - df['estimate_value']
+    # Surprises are centred on zero by construction (a forecast error), so scale only:
+    # root mean square of each event type's surprises
+    scale = np.sqrt((df['surprise'] ** 2).groupby(df['event'], sort=False).transform('mean'))
+    enough = df.groupby('event', sort=False)['surprise'].transform('count') >= config.SURPRISE_MIN_EVENTS
+    df['surprise_z'] = (df['surprise'] / scale.where(enough & (scale > 0))).astype(float)
+
+    edges = [-np.inf] + list(config.SURPRISE_BUCKETS.values())[:-1] + [np.inf]
+    df['surprise_bucket'] = pd.cut(df['surprise_z'], bins=edges, labels=list(config.SURPRISE_BUCKETS))
+    return df
+
+def _bucket_onehot(study):
+    events = add_surprise(study.events)
+    codes = events['surprise_bucket'].cat.codes.to_numpy()
+    onehot = np.zeros((len(codes), len(config.SURPRISE_BUCKETS)))
+    has_bucket = codes >= 0
+    onehot[np.flatnonzero(has_bucket), codes[has_bucket]] = 1.0
+    return events, onehot
+
+def surprise_paths(study):
+    """
+    Average reaction path per surprise bucket and asset, from one contraction over all
+    events: long DataFrame (bucket, asset, minutes_relative, mean, n), where n is the
+    number of events in the bucket with data at that minute (gaps carried forward).
+    """
+    events, onehot = _bucket_onehot(study)
+    values = study.filled().values
+    has_bar = ~np.isnan(values)
+
+    counts = np.einsum('eb,eam->bam', onehot, has_bar.astype(float))
+    sums = np.einsum('eb,eam->bam', onehot, np.where(has_bar, values, 0.0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+
+    n_buckets, n_assets, n_minutes = means.shape
+    df = pd.DataFrame({
+        'bucket': np.repeat(list(config.SURPRISE_BUCKETS), n_assets * n_minutes),
+        'asset': np.tile(np.repeat(study.assets, n_minutes), n_buckets),
+        'minutes_relative': np.tile(study.minutes, n_buckets * n_assets),
+        'mean': means.ravel(),
+        'n': counts.ravel().astype(int)
+    })
+    return df[df['n'] > 0].reset_index(drop=True)
+
+def bucket_counts(study):
+    """
+    Events per surprise bucket (and how many had no usable surprise).
+    """
+    events = add_surprise(study.events)
+    counts = events['surprise_bucket'].value_counts(sort=False)
+    return pd.concat([counts, pd.Series({'No surprise': int(events['surprise_bucket'].isna().sum())})])
+
+def surprise_betas(study, horizons=None):
+    """
+    Regression of each asset's move at +h minutes on the standardized surprise,
+    for every asset and horizon at once: DataFrame (asset, horizon, beta, alpha, r2, n).
+    beta is the % move per one standard deviation of surprise.
+    """
+    horizons = HORIZONS if horizons is None else horizons
+    events = add_surprise(study.events)
+    z = events['surprise_z'].to_numpy(dtype=float)
+
+    filled = study.filled().values
+    cols = [np.searchsorted(study.minutes, h, side='right') - 1 for h in horizons]
+    y = np.stack([
+        filled[:, :, col] if 0 <= col and h <= study.minutes[-1] else np.full(filled.shape[:2], np.nan)
+        for h, col in zip(horizons, cols)
+    ], axis=2)
+
+    # Only (event, asset, horizon) cells with both a surprise and a move take part
+    x = np.broadcast_to(z[:, None, None], y.shape)
+    use = ~np.isnan(x) & ~np.isnan(y)
+    n = use.sum(axis=0)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        x, y = np.where(use, x, np.nan), np.where(use, y, np.nan)
+        x_mean, y_mean = np.nanmean(x, axis=0), np.nanmean(y, axis=0)
+        dx, dy = x - x_mean, y - y_mean
+        sxx, syy, sxy = np.nansum(dx * dx, axis=0), np.nansum(dy * dy, axis=0), np.nansum(dx * dy, axis=0)
+        beta = np.where((n >= 2) & (sxx > 0), sxy / sxx, np.nan)
+        alpha = y_mean - beta * x_mean
+        r2 = np.where(syy > 0, sxy * sxy / (sxx * syy), np.nan)
+
+    n_assets, n_horizons = beta.shape
+    df = pd.DataFrame({
+        'asset': np.repeat(study.assets, n_horizons),
+        'horizon': np.tile(list(horizons), n_assets),
+        'beta': beta.ravel(),
+        'alpha': alpha.ravel(),
+        'r2': r2.ravel(),
+        'n': n.ravel()
+    })
+    return df[df['n'] > 0].reset_index(drop=True)
+
+def write_surprise(study, out_dir, horizons=None):
+    """
+    Writes surprise_events.csv (parsed values and buckets), surprise_paths.csv and
+    surprise_betas.csv to out_dir.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    columns = ['event', 'date', 'actual', 'estimate', 'previous', 'actual_value', 'estimate_value',
+               'previous_value', 'surprise', 'surprise_z', 'surprise_bucket']
+    events = add_surprise(study.events)
+    events[[c for c in columns if c in events]].to_csv(os.path.join(out_dir, 'surprise_events.csv'), index=False)
+    surprise_paths(study).to_csv(os.path.join(out_dir, 'surprise_paths.csv'), index=False)
+    surprise_betas(study, horizons).to_csv(os.path.join(out_dir, 'surprise_betas.csv'), index=False)
+
+def print_surprise(study, horizons=None):
+    """
+    Prints events per bucket, the average move per bucket at each horizon and the betas.
+    """
+    horizons = HORIZONS if horizons is None else horizons
+    print("\nEvents per surprise bucket:")
+    print(bucket_counts(study).to_string())
+    if add_surprise(study.events)['surprise_z'].isna().all():
+        print(f"\nNo event type has {config.SURPRISE_MIN_EVENTS} releases with both an actual and an estimate, "
+              f"so no surprise can be standardized: select more releases (--days)")
+
+    paths = surprise_paths(study)
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.float_format', '{:.3f}'.format):
+        for h in horizons:
+            at = paths[paths['minutes_relative'] == h]
+            if at.empty:
+                continue
+            table = at.pivot(index='asset', columns='bucket', values='mean')
+            table = table.reindex(index=study.assets, columns=[b for b in config.SURPRISE_BUCKETS if b in table.columns])
+            print(f"\nAverage move at +{h}m by surprise (%):")
+            print(table.to_string())
+
+        betas = surprise_betas(study, horizons)
+        if not betas.empty:
+            print("\nBeta of the move on the standardized surprise (% per 1 sd):")
+            print(betas.pivot(index='asset', columns='horizon', values='beta').reindex(study.assets).to_string())
@@ -0,0 +1,32 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: refills `rate` tokens per second, holding at most `burst`.
+    acquire(n) blocks until n tokens are available.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        # Never ask for more than the bucket can hold, or we'd wait forever
+        n = min(float(n), self.burst)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+
+            time.sleep(wait)
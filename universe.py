@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import config
+
+# Every universe has this group; it covers all of its assets
+ALL_GROUP = "All"
+
+class Universe:
+    """
+    A set of assets ({name: ticker}) with named groups of asset names.
+    """
+
+    def __init__(self, assets, groups=None):
+        self.assets = dict(assets)
+        self.groups = {ALL_GROUP: list(self.assets)}
+        for group, names in (groups or {}).items():
+            members = [name for name in names if name in self.assets]
+            if members and group != ALL_GROUP:
+                self.groups[group] = members
+
+    def __len__(self):
+        return len(self.assets)
+
+    def __repr__(self):
+        return f"Universe({len(self)} assets, groups: {', '.join(self.groups)})"
+
+    @property
+    def names(self):
+        return list(self.assets)
+
+    def membership(self, names):
+        """
+        Boolean matrix (asset, group) saying which of `names` belong to each group.
+        """
+        names = np.asarray(names, dtype=object)
+        matrix = np.zeros((len(names), len(self.groups)), dtype=bool)
+        for g, members in enumerate(self.groups.values()):
+            matrix[:, g] = np.isin(names, members)
+        return matrix
+
+def default_universe():
+    """
+    The configured ASSETS with ASSET_GROUPS.
+    """
+    return Universe(config.ASSETS, config.ASSET_GROUPS)
+
+def load_universe(path=None):
+    """
+    Reads a universe from a CSV with a 'ticker' column and optional 'name' and
+    'group' columns. An asset in several groups lists them separated by ';'.
+
+        ticker,name,group
+        AAPL,Apple,Tech;Mega Caps
+        JPM,JPMorgan,Financials
+
+    Without a path, returns the configured ASSETS.
+    """
+    if path is None:
+        return default_universe()
+
+    df = pd.read_csv(path, dtype=str).fillna('')
+    if 'ticker' not in df.columns:
+        raise ValueError(f"{path} needs a 'ticker' column")
+
+    df['ticker'] = df['ticker'].str.strip()
+    df = df[df['ticker'] != '']
+    names = df['name'].str.strip() if 'name' in df.columns else df['ticker']
+    names = names.where(names != '', df['ticker'])
+
+    assets = {}
+    groups = {}
+    for name, ticker, group_list in zip(names, df['ticker'], df.get('group', pd.Series('', index=df.index))):
+        if name in assets:
+            continue
+        assets[name] = ticker
+        for group in filter(None, (g.strip() for g in group_list.split(';'))):
+            groups.setdefault(group, []).append(name)
+
+    return Universe(assets, groups)
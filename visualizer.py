@@ -1,33 +1,62 @@
+import numpy as np
 import plotly.graph_objects as go
 import config
+import profiler
+from impact_series import as_impact_series
+from surprise import parse_values
 
-def plot_event_impact(event_row, impact_data):
+def downsample(x, y, max_points):
+    """
+    Thins a line to about max_points points while keeping its shape: the points are
+    split into equal buckets and each bucket keeps its lowest and highest point
+    (plus the first and last point overall), so spikes survive.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 4:
+        return x, y
+
+    n_buckets = (max_points - 2) // 2
+    bucket = np.arange(n) * n_buckets // n
+    # Within each bucket, sort by value: the first entry is the min, the last the max
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    keep = np.unique(np.concatenate([[0, n - 1], order[starts], order[ends]]))
+    return x[keep], y[keep]
+
+@profiler.timed("plot_build")
+def plot_event_impact(event_row, impact_data, groups=None):
     """
     Generates a Plotly chart showing the impact of the event on various assets.
+    groups ({name: [asset names]}) become the view buttons; default config.ASSET_GROUPS.
     """
     event_name = event_row['event']
     event_time = event_row['date']
     actual = event_row.get('actual', 'N/A')
     estimate = event_row.get('estimate', 'N/A')
     
+    # DataFrames (e.g. from live mode) and ImpactSeries are both fine
+    impact_data = {asset_name: as_impact_series(series) for asset_name, series in impact_data.items()}
+    
     fig = go.Figure()
     
     # Calculate volatility for each asset to determine line style
     # Assets with bigger moves get thicker, brighter lines
     max_moves = {}
-    for asset_name, df in impact_data.items():
-        max_moves[asset_name] = df['pct_change'].abs().max()
+    for asset_name, series in impact_data.items():
+        max_moves[asset_name] = series.max_abs()
     
     # Sort assets by volatility to draw important ones on top
     sorted_assets = sorted(max_moves.items(), key=lambda x: x[1])
     
-    # Define groups for buttons
-    core_assets = ["Equities", "FX", "Rates", "Volatility"]
-    sector_assets = ["Tech", "Financials", "Healthcare", "Cons. Disc", "Cons. Staples", 
-                     "Energy", "Utilities", "Industrials", "Materials", "Real Estate", "Comm. Svcs"]
+    # Big charts (many assets or long windows) go to WebGL and each line is
+    # thinned to a fixed point budget, so the page stays quick to load and pan
+    total_points = sum(len(series) for series in impact_data.values())
+    use_webgl = total_points > config.CHART_WEBGL_POINTS or len(impact_data) > config.CHART_WEBGL_TRACES
+    Scatter = go.Scattergl if use_webgl else go.Scatter
     
     for asset_name, _ in sorted_assets:
-        df = impact_data[asset_name]
+        series = impact_data[asset_name]
         move_size = max_moves[asset_name]
         
         # Determine style based on move size
@@ -40,14 +69,11 @@ def plot_event_impact(event_row, impact_data):
         else: # Small move (noise)
             width = 1
             opacity = 0.4
-            
-        # Determine group for visibility toggling
-        # We use 'legendgroup' to group them, but for buttons we need to know indices
-        # For simplicity, we'll just add them all and use the button logic to show/hide
         
-        fig.add_trace(go.Scatter(
-            x=df['minutes_relative'],
-            y=df['pct_change'],
+        x, y = downsample(series.minutes_relative, series.pct_change, config.CHART_POINTS_PER_TRACE)
+        fig.add_trace(Scatter(
+            x=x,
+            y=y,
             mode='lines',
             name=asset_name,
             line=dict(width=width),
@@ -58,43 +84,28 @@ def plot_event_impact(event_row, impact_data):
     # Add vertical line at t=0 (Event Time)
     fig.add_vline(x=0, line_width=2, line_dash="dash", line_color="white", annotation_text="Release")
     
-    # Create Buttons for Views
-    # We need to know which traces belong to which group.
-    # Since we added them in sorted order, it's tricky to know indices.
-    # A simpler way for buttons is to rely on trace names.
-    
-    # Actually, Plotly buttons use 'visible' array (True/False/LegendOnly)
-    # We need to construct these arrays.
-    
-    # Let's rebuild the trace adding loop to be simpler for button logic
-    # We will add Core first, then Sectors, to make indices predictable? 
-    # No, sorting by volatility is better for visuals.
-    
-    # Alternative: Use 'legendgroup' and just let user click legend? 
-    # User asked for buttons.
-    
-    # Let's stick to the sorted addition for visual layering, but we'll calculate visibility masks dynamically.
-    
-    total_traces = len(fig.data) # Includes the vertical line? No, vline is a shape/annotation usually, but add_vline adds a shape.
-    # fig.data only contains the Scatters we added.
+    # One view button per asset group. Traces were added in volatility order, so each
+    # visibility mask is built once from that order and the group membership
+    groups = config.ASSET_GROUPS if groups is None else groups
+    trace_names = [asset_name for asset_name, _ in sorted_assets]
+    buttons = [dict(label="All", method="update", args=[{"visible": [True] * len(trace_names)}])]
+    for group, members in groups.items():
+        members = set(members)
+        if group == "All" or not members.intersection(trace_names):
+            continue
+        buttons.append(dict(
+            label=group,
+            method="update",
+            args=[{"visible": [name in members for name in trace_names]}]
+        ))
     
-    # Helper to create visibility mask
-    def create_mask(target_group):
-        mask = []
-        for trace in fig.data:
-            name = trace.name
-            # Check if name matches any in the target group
-            # We need to match partial names because config has "Equities (SPY)" etc.
-            is_core = any(c in name for c in ["SPY", "EURUSD", "TNX", "VIX"])
-            is_sector = any(s in name for s in ["XLK", "XLF", "XLV", "XLY", "XLP", "XLE", "XLU", "XLI", "XLB", "XLRE", "XLC"])
-            
-            if target_group == "all":
-                mask.append(True)
-            elif target_group == "core":
-                mask.append(True if is_core else False)
-            elif target_group == "sectors":
-                mask.append(True if is_sector else False)
-        return mask
+    # Title shows what was released, how it compared to expectations and the bar size used
+    intervals = sorted({series.interval for series in impact_data.values() if series.interval})
+    bars = f" | Bars: {', '.join(intervals)}" if intervals else ""
+    surprise = parse_values([actual])[0] - parse_values([estimate])[0]
+    surprise = f" | Surprise: {surprise:+.4g}" if not np.isnan(surprise) else ""
+    title_text = (f"{event_name} Impact<br>"
+                  f"<sup>{event_time} UTC | Actual: {actual} | Forecast: {estimate}{surprise}{bars}</sup>")
 
     fig.update_layout(
         title=title_text,
@@ -112,17 +123,7 @@ def plot_event_impact(event_row, impact_data):
                 x=0,
                 y=1.15,
                 showactive=True,
-                buttons=list([
-                    dict(label="All",
-                         method="update",
-                         args=[{"visible": create_mask("all")}]),
-                    dict(label="Core Assets",
-                         method="update",
-                         args=[{"visible": create_mask("core")}]),
-                    dict(label="Sectors",
-                         method="update",
-                         args=[{"visible": create_mask("sectors")}])
-                ]),
+                buttons=buttons,
             )
         ]
     )